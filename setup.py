@@ -60,9 +60,8 @@ setup(
         "eutils>=0.3.2",
         "nose",
         "prettytable",
-        "psycopg2",
+        "psycopg2>=2.7",
         "pytz",
-        "recordtype",
         "sqlalchemy",
         "uta-align",
     ],
@@ -1,4 +1,5 @@
 refresh materialized view exon_set_exons_fp_mv;
+refresh materialized view exon_set_span_mv;
 refresh materialized view tx_aln_cigar_mv;
 refresh materialized view tx_exon_set_summary_mv;
 refresh materialized view tx_aln_summary_mv;
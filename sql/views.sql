@@ -58,6 +58,25 @@ create index exon_set_exons_fp_mv_alt_ac_ix on exon_set_exons_fp_mv(alt_ac);
 create index exon_set_exons_fp_mv_alt_aln_method_ix on exon_set_exons_fp_mv(alt_aln_method);
 grant select on exon_set_exons_fp_mv to public;
 
+-- spans are computed from exon_set and exon directly, so that every
+-- exon set appears, whether or not its alt_ac is annotated in seq_anno.
+-- The composite gist index (via btree_gist) answers an overlap query
+-- on one (alt_ac, alt_aln_method) with a single index scan.
+create extension if not exists btree_gist;
+create materialized view exon_set_span_mv as
+select ES.exon_set_id, ES.tx_ac, ES.alt_ac, ES.alt_aln_method, ES.alt_strand,
+       int4range(min(E.start_i), max(E.end_i)) as span
+from exon_set ES
+join exon E on ES.exon_set_id=E.exon_set_id
+group by ES.exon_set_id
+WITH NO DATA;
+comment on materialized view exon_set_span_mv is 'alt_ac interval spanned by each exon set, range-indexed for region queries';
+create index exon_set_span_mv_region_ix on exon_set_span_mv using gist (alt_ac, alt_aln_method, span);
+grant select on exon_set_span_mv to public;
+-- e.g., transcripts overlapping [start_i, end_i):
+-- select * from exon_set_span_mv
+-- where alt_ac='NC_000003.11' and alt_aln_method='splign' and span && int4range(10183000, 10183100);
+
 create or replace view tx_exon_set_summary_dv as
 select hgnc,cds_md5,es_fingerprint,tx_ac,alt_ac,alt_aln_method,alt_strand,exon_set_id,n_exons,se_i,starts_i,ends_i,lengths
 from transcript T
@@ -0,0 +1,90 @@
+import unittest
+
+from uta.aiodataprovider import AsyncUTADataProvider, asyncio
+from uta.exceptions import UTAError
+from uta.query_cache import LRUCache
+
+
+class _FakePool(object):
+    """stand-in for an asyncpg pool that returns canned rows after a delay"""
+
+    def __init__(self, rows, delay=0.01):
+        self.rows = rows
+        self.delay = delay
+        self.calls = []
+
+    def fetch(self, sql, *args):
+        self.calls.append((sql, args))
+        loop = asyncio.get_event_loop()
+        fut = loop.create_future()
+        loop.call_later(self.delay, fut.set_result, self.rows)
+        return fut
+
+
+@unittest.skipIf(asyncio is None, "asyncio is not available")
+class Test_uta_aiodataprovider(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.rows = [{"tx_ac": "NM_1.1", "alt_start_i": 100}, {"tx_ac": "NM_1.1", "alt_start_i": 300}]
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _run(self, *aws):
+        return self.loop.run_until_complete(asyncio.gather(*aws))
+
+    def test_coalescing(self):
+        pool = _FakePool(self.rows)
+        dp = AsyncUTADataProvider(pool)
+        results = self._run(*[dp.get_tx_exons("NM_1.1", "NC_1.1", "splign") for _ in range(100)])
+        self.assertEqual(results, [self.rows] * 100)
+        self.assertEqual(len(pool.calls), 1)
+        sql, args = pool.calls[0]
+        self.assertIn("tx_ac=$1 and alt_ac=$2 and alt_aln_method=$3", sql)
+        self.assertEqual(args, ("NM_1.1", "NC_1.1", "splign"))
+
+        # not in flight and not cached: queried again
+        self._run(dp.get_tx_exons("NM_1.1", "NC_1.1", "splign"),
+                  dp.get_tx_exons("NM_2.1", "NC_1.1", "splign"))
+        self.assertEqual(len(pool.calls), 3)
+
+    def test_cache(self):
+        pool = _FakePool(self.rows[:1])
+        dp = AsyncUTADataProvider(pool, cache=LRUCache())
+        self._run(dp.get_tx_info("NM_1.1", "NC_1.1", "splign"))
+        ti, = self._run(dp.get_tx_info("NM_1.1", "NC_1.1", "splign"))
+        self.assertEqual(ti, self.rows[0])
+        self.assertEqual(len(pool.calls), 1)
+
+        # callers get copies; changing one doesn't change the cache
+        ti["tx_ac"] = "changed"
+        ti, = self._run(dp.get_tx_info("NM_1.1", "NC_1.1", "splign"))
+        self.assertEqual(ti["tx_ac"], "NM_1.1")
+
+    def test_error(self):
+        dp = AsyncUTADataProvider(_FakePool(self.rows))
+        with self.assertRaises(UTAError):
+            self._run(dp.get_tx_info("NM_1.1", "NC_1.1", "splign"))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
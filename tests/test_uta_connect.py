@@ -0,0 +1,97 @@
+import unittest
+
+from sqlalchemy.dialects import postgresql
+import testing.postgresql
+
+import uta
+
+
+class _FakeCursor(object):
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, sql):
+        self.con.executed.append(sql)
+
+    def close(self):
+        pass
+
+
+class _FakeDBAPIConnection(object):
+    def __init__(self):
+        self.executed = []
+        self.n_commits = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.n_commits += 1
+
+
+class Test_uta_connect(unittest.TestCase):
+
+    def tearDown(self):
+        uta.dispose_engines()
+
+    def test_engine_cache(self):
+        s1 = uta.connect("sqlite://")
+        s2 = uta.connect("sqlite://")
+        s3 = uta.connect("sqlite://", pool_recycle=3600)
+        self.assertIsNot(s1, s2)
+        self.assertIs(s1.bind, s2.bind)
+        self.assertIsNot(s1.bind, s3.bind)
+        self.assertEqual(s3.bind.pool._recycle, 3600)
+        self.assertEqual(s1.execute("select 1").scalar(), 1)
+
+        uta.dispose_engines()
+        self.assertIsNot(uta.connect("sqlite://").bind, s1.bind)
+
+    def test_session_settings(self):
+        preparer = postgresql.dialect().identifier_preparer
+        self.assertIsNone(uta._session_settings_sql(preparer, None, None, None))
+        sql = uta._session_settings_sql(preparer, "uta_1_1", "uta admin", 30000)
+        self.assertEqual(sql, 'set role "uta admin"; set search_path = uta_1_1; set statement_timeout = 30000')
+
+        con = _FakeDBAPIConnection()
+        uta._settings_listener(sql)(con, None)
+        self.assertEqual(con.executed, [sql])
+        self.assertEqual(con.n_commits, 1)
+
+    def test_session_settings_postgresql(self):
+        calls = []
+        listener = uta._settings_listener
+        uta._settings_listener = lambda sql: lambda *args: calls.append(args) or listener(sql)(*args)
+        try:
+            with testing.postgresql.Postgresql() as pg:
+                for _ in range(3):
+                    session = uta.connect(pg.url(), schema="uta_test", statement_timeout=1234)
+                    self.assertEqual(session.execute("show statement_timeout").scalar(), "1234ms")
+                    session.rollback()
+                    self.assertEqual(session.execute("show search_path").scalar(), "uta_test")
+                    session.close()
+                uta.dispose_engines()
+        finally:
+            uta._settings_listener = listener
+        self.assertEqual(len(calls), 1)             # once, for the one pooled connection
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,227 @@
+import os
+import re
+import unittest
+
+import sqlalchemy as sa
+import sqlalchemy.orm as sao
+import sqlalchemy.pool
+import testing.postgresql
+
+import uta.models as usam
+from uta.dataprovider import UTADataProvider, _portable_queries
+from uta.query_cache import LRUCache
+
+
+def _sqlite_session():
+    """session on an in-memory sqlite database with the uta schema
+    attached under its usual name"""
+    engine = sa.create_engine("sqlite://", poolclass=sa.pool.StaticPool)
+
+    @sa.event.listens_for(engine, "connect")
+    def _attach(dbapi_con, con_record):
+        dbapi_con.execute("attach database ':memory:' as " + usam.schema_name)
+
+    usam.Base.metadata.create_all(engine)
+    return sao.sessionmaker(bind=engine)()
+
+
+def _load_views(cur):
+    """create the views of sql/internal-views.sql and sql/views.sql
+    with DBAPI cursor cur (the view definitions contain %s, so SQLAlchemy
+    parameter formatting is bypassed)"""
+    sql_dir = os.path.join(os.path.dirname(__file__), "..", "sql")
+    cur.execute("select 1 from pg_available_extensions where name = 'btree_gist'")
+    has_btree_gist = cur.fetchone() is not None
+    cur.execute("set local search_path = " + usam.schema_name)
+    for fn in ["internal-views.sql", "views.sql"]:
+        sql = open(os.path.join(sql_dir, fn)).read()
+        if not has_btree_gist:
+            # PostgreSQL without contrib; exon_set_span_mv is left unindexed
+            sql = sql.replace("create extension if not exists btree_gist;", "")
+            sql = re.sub(r"create index exon_set_span_mv_region_ix [^;]*;", "", sql)
+        cur.execute(sql)
+
+
+def _add_fixture(session):
+    o = usam.Origin(name="test")
+    session.add(o)
+    for ac, hgnc, exons in [("NM_1.1", "A", [(100, 200), (300, 400)]),
+                            ("NM_2.1", "A", [(350, 500)]),
+                            ("NM_3.1", "B", [(1000, 1100)])]:
+        t = usam.Transcript(ac=ac, origin=o, hgnc=hgnc, cds_start_i=10, cds_end_i=50)
+        session.add(t)
+        for method in ["transcript", "splign"]:
+            es = usam.ExonSet(transcript=t, alt_ac=ac if method == "transcript" else "NC_1.1",
+                              alt_strand=1, alt_aln_method=method)
+            for i, (s, e) in enumerate(exons):
+                session.add(usam.Exon(exon_set=es, start_i=s, end_i=e, ord=i))
+    session.add(usam.Meta(key="schema_version", value="1.1"))
+    session.commit()
+
+
+class BatchTestMixin(object):
+
+    def test_batch_matches_keys(self):
+        # the keys' columns combine to another existing key, (NM_2.1,
+        # NC_1.1, splign), which must not be fetched
+        keys = [("NM_1.1", "NC_1.1", "splign"), ("NM_2.1", "NM_2.1", "transcript")]
+        dp = UTADataProvider(self.session)
+        n_rows = []
+        _execute = dp._execute
+        dp._execute = lambda name, params: n_rows.append(len(_execute(name, params))) or _execute(name, params)
+        results = dp.get_tx_info_batch(keys)
+        self.assertEqual(sorted(results), sorted(keys))
+        self.assertEqual([r["tx_ac"] for k, r in sorted(results.items())], ["NM_1.1", "NM_2.1"])
+        self.assertEqual(n_rows, [2])
+
+
+class Test_uta_dataprovider(BatchTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        self.session = _sqlite_session()
+        _add_fixture(self.session)
+
+    def test_queries(self):
+        dp = UTADataProvider(self.session)
+        ti = dp.get_tx_info("NM_1.1", "NC_1.1", "splign")
+        self.assertEqual((ti["hgnc"], ti["cds_start_i"], ti["cds_end_i"]), ("A", 10, 50))
+        self.assertIsNone(dp.get_tx_info("NM_1.1", "NC_2.1", "splign"))
+        self.assertEqual([r["tx_ac"] for r in dp.get_tx_for_gene("A")], ["NM_1.1", "NM_2.1"])
+        self.assertEqual([(r["tx_ac"], r["start_i"], r["end_i"])
+                          for r in dp.get_tx_for_region("NC_1.1", "splign", 390, 1000)],
+                         [("NM_1.1", 100, 400), ("NM_2.1", 350, 500)])
+
+    def test_region_index(self):
+        dp = UTADataProvider(self.session)
+        dpi = UTADataProvider(self.session, region_index=True)
+        for start_i, end_i in [(0, 100), (0, 101), (199, 300), (200, 300), (390, 1000), (0, 2000), (1100, 1200)]:
+            self.assertEqual(dpi.get_tx_for_region("NC_1.1", "splign", start_i, end_i),
+                             dp.get_tx_for_region("NC_1.1", "splign", start_i, end_i))
+        self.assertEqual(dpi.n_queries, 1)
+
+    def test_batch(self):
+        keys = [("NM_1.1", "NC_1.1", "splign"), ("NM_2.1", "NC_1.1", "splign"),
+                ("NM_1.1", "NM_1.1", "transcript"), ("NM_3.1", "NC_2.1", "splign"),
+                ("NM_1.1", "NC_1.1", "splign")]
+        dp = UTADataProvider(self.session)
+        dpb = UTADataProvider(self.session, batch_size=2)
+        results = dpb.get_tx_info_batch(keys)
+        self.assertEqual(results, {k: dp.get_tx_info(*k) for k in keys})
+        self.assertIsNone(results[("NM_3.1", "NC_2.1", "splign")])
+        self.assertEqual(dpb.n_queries, 2)          # 4 distinct keys in batches of 2
+
+    def test_batch_cache(self):
+        dp = UTADataProvider(self.session, cache=LRUCache())
+        dp.get_tx_info("NM_1.1", "NC_1.1", "splign")
+        n = dp.n_queries
+        results = dp.get_tx_info_batch([("NM_1.1", "NC_1.1", "splign"), ("NM_2.1", "NC_1.1", "splign")])
+        self.assertEqual(results[("NM_2.1", "NC_1.1", "splign")]["tx_ac"], "NM_2.1")
+        self.assertEqual(dp.n_queries, n + 1)
+        dp.get_tx_info("NM_2.1", "NC_1.1", "splign")
+        self.assertEqual(dp.n_queries, n + 1)
+
+    def test_cache(self):
+        dp = UTADataProvider(self.session, cache=LRUCache())
+        for _ in range(3):
+            dp.get_tx_info("NM_1.1", "NC_1.1", "splign")
+            dp.get_tx_info("NM_2.1", "NC_1.1", "splign")
+        self.assertEqual(dp.n_queries, 3)           # schema version + two transcripts
+        key = dp._cache_key("tx_info", {"tx_ac": "NM_1.1", "alt_ac": "NC_1.1", "alt_aln_method": "splign"})
+        self.assertEqual(key[:3], ("sqlite:///", usam.schema_name, "1.1"))
+
+    def test_cache_returns_copies(self):
+        # changes to results don't reach the cache
+        dp = UTADataProvider(self.session, cache=LRUCache())
+        k = ("NM_1.1", "NC_1.1", "splign")
+        getters = [
+            lambda: [dp.get_tx_info(*k)],
+            lambda: dp.get_tx_for_gene("A"),
+            lambda: dp.get_tx_for_region("NC_1.1", "splign", 0, 2000),
+            lambda: [dp.get_tx_info_batch([k])[k]],
+        ]
+        for get in getters:
+            expected = [dict(r) for r in get()]
+            for rows in [get(), get()]:
+                self.assertEqual(rows, expected)
+                rows[0]["tx_ac"] = "changed"
+
+
+class Test_uta_dataprovider_postgresql(BatchTestMixin, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls._postgresql = testing.postgresql.Postgresql()
+        cls.engine = sa.create_engine(cls._postgresql.url())
+        cls.engine.execute("create schema " + usam.schema_name)
+        usam.Base.metadata.create_all(cls.engine)
+        session = sao.sessionmaker(bind=cls.engine)()
+        _add_fixture(session)
+        session.close()
+        con = cls.engine.raw_connection()
+        try:
+            cur = con.cursor()
+            _load_views(cur)
+            cur.execute("refresh materialized view exon_set_exons_fp_mv")
+            cur.execute("refresh materialized view exon_set_span_mv")
+            con.commit()
+        finally:
+            con.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls._postgresql.stop()
+
+    def setUp(self):
+        self.session = sao.sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_batch(self):
+        keys = [("NM_1.1", "NC_1.1", "splign"), ("NM_2.1", "NC_1.1", "splign"),
+                ("NM_1.1", "NM_1.1", "transcript"), ("NM_3.1", "NC_2.1", "splign")]
+        dp = UTADataProvider(self.session, batch_size=3)
+        self.assertEqual(dp.get_tx_info_batch(keys), {k: dp.get_tx_info(*k) for k in keys})
+
+    def test_region(self):
+        # NC_1.1 has no seq_anno row; exon_set_span_mv, the region
+        # index, and the portable query must still agree
+        dp = UTADataProvider(self.session, cache=LRUCache())
+        dpi = UTADataProvider(self.session, region_index=True)
+        portable_sql = sa.text(_portable_queries["tx_for_region"].format(s=usam.schema_name + "."))
+        self.assertEqual([(r["tx_ac"], r["start_i"], r["end_i"])
+                          for r in dp.get_tx_for_region("NC_1.1", "splign", 390, 1000)],
+                         [("NM_1.1", 100, 400), ("NM_2.1", 350, 500)])
+        for start_i, end_i in [(0, 100), (0, 101), (199, 300), (200, 300), (390, 1000), (0, 2000), (1100, 1200)]:
+            rows = dp.get_tx_for_region("NC_1.1", "splign", start_i, end_i)
+            self.assertEqual(dpi.get_tx_for_region("NC_1.1", "splign", start_i, end_i), rows)
+            portable_rows = self.session.execute(portable_sql, dict(
+                alt_ac="NC_1.1", alt_aln_method="splign", start_i=start_i, end_i=end_i))
+            self.assertEqual([dict(r) for r in portable_rows], rows)
+
+        # results are copies, so changes don't reach the cache or index
+        for p in [dp, dpi]:
+            p.get_tx_for_region("NC_1.1", "splign", 0, 2000)[0]["tx_ac"] = "changed"
+            self.assertEqual(p.get_tx_for_region("NC_1.1", "splign", 0, 2000)[0]["tx_ac"], "NM_1.1")
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from uta.exon_aln_cache import ExonAlnCache
+
+
+class Test_uta_exon_aln_cache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, "exon-aln-cache.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_get_put(self):
+        cache = ExonAlnCache(self.path)
+        self.assertIsNone(cache.get("a" * 32, "b" * 32))
+        cache.put("a" * 32, "b" * 32, "10=")
+        self.assertEqual(cache.get("a" * 32, "b" * 32), "10=")
+        self.assertIsNone(cache.get("b" * 32, "a" * 32))
+        self.assertEqual(len(cache), 1)
+        cache.close()
+
+    def test_persistence(self):
+        cache = ExonAlnCache(self.path)
+        cache.put("a" * 32, "b" * 32, "5=1X4=")
+        cache.close()
+
+        cache = ExonAlnCache(self.path)
+        self.assertEqual(cache.get("a" * 32, "b" * 32), "5=1X4=")
+        cache.put("a" * 32, "b" * 32, "ignored")
+        self.assertEqual(cache.get("a" * 32, "b" * 32), "5=1X4=")
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
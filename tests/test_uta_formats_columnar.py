@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from six import StringIO
+
+from uta.formats.columnar import (ColumnarReader, ColumnarWriter, columnar_to_tsv, is_columnar,
+                                  tsv_to_columnar)
+from uta.formats.exonset import ExonSet, ExonSetWriter
+from uta.formats.geneinfo import GeneInfo, GeneInfoWriter
+from uta.formats.seqinfo import SeqInfo, SeqInfoReader, SeqInfoWriter
+
+
+class Test_formats_columnar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "f.col")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _tsv(self, writer_class, recs):
+        fh = StringIO()
+        w = writer_class(fh)
+        for r in recs:
+            w.write(r)
+        return fh.getvalue()
+
+    def test_exonset(self):
+        recs = [ExonSet("NM_01.1", "NC_01.1", "splign", "-1", "58864769,58864865;58864500,58864600"),
+                ExonSet("NM_02.1", "NM_02.1", "transcript", "1", "0,120"),
+                ExonSet("NM_03.1", "NC_01.1", "splign", "1", "")]
+        with ColumnarWriter(self.path, ExonSet) as w:
+            for r in recs:
+                w.write(r)
+        self.assertTrue(is_columnar(self.path))
+        with ColumnarReader(self.path) as rdr:
+            self.assertEqual(len(rdr), 3)
+            self.assertEqual(list(rdr), recs)
+            self.assertEqual(rdr[1], recs[1])
+            self.assertEqual(list(rdr.column("strand")), [-1, 1, 1])
+            exons = rdr.column("exons_se_i")
+            self.assertEqual(exons[0], [(58864769, 58864865), (58864500, 58864600)])
+            self.assertEqual(list(exons.starts), [58864769, 58864500, 0])
+            self.assertEqual(exons[2], [])
+
+    def test_tsv_conversion(self):
+        recs = [SeqInfo("m1", "NCBI", "NM_1.1", 'descr with "quotes"', "3", "ACG"),
+                SeqInfo("m2", "NCBI", "NM_2.1", "", "1000000", None)]
+        tsv = self._tsv(SeqInfoWriter, recs)
+        self.assertEqual(tsv_to_columnar(StringIO(tsv), self.path), 2)
+        with ColumnarReader(self.path) as rdr:
+            self.assertEqual(list(rdr), list(SeqInfoReader(StringIO(tsv))))
+        out = StringIO()
+        columnar_to_tsv(self.path, out)
+        self.assertEqual(out.getvalue(), tsv)
+
+    def test_geneinfo(self):
+        gi = GeneInfo(gene_id="1", tax_id="9606", hgnc="A1BG", maploc="19q13.4", aliases=["A1B", "ABG"],
+                      type="protein-coding", summary="", descr="alpha-1-B glycoprotein", xrefs=["MIM:138670"])
+        tsv = self._tsv(GeneInfoWriter, [gi])
+        tsv_to_columnar(StringIO(tsv), self.path)
+        with ColumnarReader(self.path) as rdr:
+            self.assertEqual(list(rdr), [gi])
+        out = StringIO()
+        columnar_to_tsv(self.path, out)
+        self.assertEqual(out.getvalue(), tsv)
+
+    def test_inexact_intervals(self):
+        with self.assertRaises(ValueError):
+            ColumnarWriter(self.path, ExonSet).write(ExonSet("NM_01.1", "NC_01.1", "splign", "1", "0, 120"))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,91 @@
+import csv
+import pickle
+import unittest
+
+from six import StringIO
+
+from uta.formats.exonset import ExonSet, ExonSetReader, ExonSetWriter
+from uta.formats.geneinfo import GeneInfo, GeneInfoReader, GeneInfoWriter
+from uta.formats.seqinfo import SeqInfo, SeqInfoReader, SeqInfoWriter
+
+
+class Test_formats_tsv(unittest.TestCase):
+
+    def test_record(self):
+        es = ExonSet("NM_01.1", "NC_01.1", "splign", "-1", "0,10;20,30")
+        self.assertEqual(es, ExonSet(tx_ac="NM_01.1", alt_ac="NC_01.1", method="splign",
+                                     strand="-1", exons_se_i="0,10;20,30"))
+        es.strand = "1"
+        self.assertEqual(list(es._asdict().items())[3], ("strand", "1"))
+        self.assertEqual(es._replace(method="blat").method, "blat")
+        self.assertEqual(pickle.loads(pickle.dumps(es, 2)), es)
+        with self.assertRaises(AttributeError):
+            es.other = 1
+        with self.assertRaises(TypeError):
+            ExonSet("NM_01.1")
+
+    def test_roundtrip(self):
+        recs = [ExonSet("NM_{}.1".format(i), "NC_01.1", "splign", str(i % 2), "{},{}".format(i, i + 10))
+                for i in range(10)]
+        fh = StringIO()
+        esw = ExonSetWriter(fh)
+        for es in recs:
+            esw.write(es)
+        self.assertEqual(fh.getvalue().split("\n")[0], "\t".join(ExonSet._fields))
+        self.assertEqual(list(ExonSetReader(StringIO(fh.getvalue()))), recs)
+
+    def test_dictwriter_compat(self):
+        # files written by csv.DictWriter, with columns out of order and
+        # fields that need quoting, read as before
+        fields = ["seq", "len", "descr", "ac", "origin", "md5"]
+        rows = [dict(md5="m1", origin="o", ac="NM_1", descr='a "quoted"\tdescr', len="3", seq="ACG"),
+                dict(md5="m2", origin="o", ac="NM_2", descr="multi\nline", len="3", seq="")]
+        fh = StringIO()
+        dw = csv.DictWriter(fh, fieldnames=fields, delimiter=str("\t"), lineterminator="\n")
+        dw.writeheader()
+        for r in rows:
+            dw.writerow(r)
+        sis = list(SeqInfoReader(StringIO(fh.getvalue())))
+        self.assertEqual([si.descr for si in sis], [r["descr"] for r in rows])
+        self.assertEqual([si.seq for si in sis], ["ACG", None])
+
+        # and are written as csv would
+        fh2 = StringIO()
+        siw = SeqInfoWriter(fh2)
+        for si in sis:
+            siw.write(si)
+        fh3 = StringIO()
+        csv.writer(fh3, delimiter=str("\t"), lineterminator="\n").writerows(
+            [SeqInfo._fields] + [[v or "" for v in si] for si in sis])
+        self.assertEqual(fh2.getvalue(), fh3.getvalue())
+
+    def test_geneinfo_lists(self):
+        gi = GeneInfo(gene_id="1", tax_id="9606", hgnc="A1BG", maploc="19q13.4", aliases=["A1B", "ABG"],
+                      type="protein-coding", summary="", descr="alpha-1-B glycoprotein", xrefs=["MIM:138670"])
+        fh = StringIO()
+        GeneInfoWriter(fh).write(gi)
+        self.assertEqual(list(GeneInfoReader(StringIO(fh.getvalue()))), [gi])
+
+    def test_bad_header(self):
+        with self.assertRaises(RuntimeError):
+            ExonSetReader(StringIO("tx_ac\talt_ac\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
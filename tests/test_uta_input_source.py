@@ -0,0 +1,75 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from uta.input_source import InputSource
+
+
+class Test_InputSource(unittest.TestCase):
+
+    lines = [b"h1\th2\n"] + [("a{i}\tb{i}\n".format(i=i)).encode("ascii") for i in range(1000)]
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, fn, opener):
+        path = os.path.join(self.tmpdir, fn)
+        with opener(path, "wb") as fh:
+            fh.write(b"".join(self.lines))
+        return path
+
+    def test_plain_and_gzip(self):
+        for fn, opener in (("f.tsv", open), ("f.tsv.gz", gzip.open)):
+            src = InputSource(self._write(fn, opener))
+            self.assertEqual(list(src), self.lines)
+            self.assertEqual(src.n_lines, len(self.lines))
+            self.assertEqual(src.progress(), 1.0)
+            src.close()
+
+    def test_format(self):
+        self.assertEqual(InputSource(self._write("f.tsv", open)).format, "plain")
+        self.assertEqual(InputSource(self._write("f.tsv.gz", gzip.open)).format, "gzip")
+
+    def test_sidecar(self):
+        path = self._write("f.tsv.gz", gzip.open)
+        src = InputSource(path)
+        self.assertIsNone(src.n_lines_expected)
+        list(src)
+        src.close()
+
+        src = InputSource(path)
+        self.assertEqual(src.n_lines_expected, len(self.lines))
+        it = iter(src)
+        for _ in range(len(self.lines) // 2):
+            next(it)
+        self.assertAlmostEqual(src.progress(), 0.5, places=2)
+        src.close()
+
+        # rewriting the file invalidates the line count
+        os.utime(path, (0, 0))
+        self.assertIsNone(InputSource(path).n_lines_expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
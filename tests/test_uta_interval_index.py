@@ -0,0 +1,47 @@
+import random
+import unittest
+
+from uta.interval_index import NCList
+
+
+class Test_uta_interval_index(unittest.TestCase):
+
+    def test_overlapping(self):
+        rng = random.Random(0)
+        intervals = []
+        for i in range(2000):
+            start = rng.randrange(0, 100000)
+            end = start + rng.choice([1, 10, 100, 1000, 20000])
+            intervals.append((start, end, i))
+        intervals += [(500, 600, "dup1"), (500, 600, "dup2")]
+        ncl = NCList(intervals)
+        self.assertEqual(len(ncl), len(intervals))
+        for _ in range(500):
+            start = rng.randrange(-100, 110000)
+            end = start + rng.choice([1, 5, 500, 5000])
+            expected = set(v for s, e, v in intervals if s < end and e > start)
+            self.assertEqual(set(ncl.overlapping(start, end)), expected)
+
+    def test_empty(self):
+        self.assertEqual(NCList([]).overlapping(0, 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
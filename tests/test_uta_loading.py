@@ -0,0 +1,725 @@
+import configparser
+import gzip
+import logging
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import tempfile
+import unittest
+
+from bioutils.digests import seq_md5
+from bioutils.sequences import reverse_complement
+import sqlalchemy
+import testing.postgresql
+import uta_align.align.algorithms as utaaa
+
+import uta
+from uta.exceptions import UTAError
+import uta.formats.exonset as ufes
+import uta.formats.geneinfo as ufgi
+import uta.formats.seqinfo as ufsi
+import uta.formats.txinfo as ufti
+import uta.loading as ul
+usam = uta.models
+
+
+class _LogCapture(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self, level=logging.INFO)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class LoadingTestBase(unittest.TestCase):
+    """runs loaders against a scratch PostgreSQL database, recreating
+    the schema for each load"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._postgresql = testing.postgresql.Postgresql()
+        cls.db_url = cls._postgresql.url()
+        cls.cf = configparser.ConfigParser()
+        cls.cf.read_dict({"uta": {"admin_role": "postgres"}, "loading": {}, "sequences": {}})
+
+    @classmethod
+    def tearDownClass(cls):
+        uta.dispose_engines()
+        cls._postgresql.stop()
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def reset_db(self):
+        """recreate the schema, with one origin, and return a session"""
+        uta.dispose_engines()
+        engine = sqlalchemy.create_engine(self.db_url)
+        engine.execute("drop schema if exists {s} cascade; create schema {s}".format(s=usam.schema_name))
+        usam.Base.metadata.create_all(engine)
+        engine.dispose()
+        session = self.connect()
+        session.add(usam.Origin(name="test"))
+        session.commit()
+        return session
+
+    def load_views(self):
+        """create the views of sql/internal-views.sql and sql/views.sql"""
+        sql_dir = os.path.join(os.path.dirname(__file__), "..", "sql")
+        engine = sqlalchemy.create_engine(self.db_url)
+        # the view definitions contain %s, so bypass parameter formatting
+        con = engine.raw_connection()
+        try:
+            cur = con.cursor()
+            cur.execute("select 1 from pg_available_extensions where name = 'btree_gist'")
+            has_btree_gist = cur.fetchone() is not None
+            cur.execute("set local search_path = " + usam.schema_name)
+            for fn in ["internal-views.sql", "views.sql"]:
+                sql = open(os.path.join(sql_dir, fn)).read()
+                if not has_btree_gist:
+                    # PostgreSQL without contrib; exon_set_span_mv is left unindexed
+                    sql = sql.replace("create extension if not exists btree_gist;", "")
+                    sql = re.sub(r"create index exon_set_span_mv_region_ix [^;]*;", "", sql)
+                cur.execute(sql)
+            con.commit()
+        finally:
+            con.close()
+            engine.dispose()
+
+    def connect(self):
+        return uta.connect(self.db_url, schema=usam.schema_name, role=self.cf.get("uta", "admin_role"))
+
+    def assertConnectionReleased(self, session):
+        self.assertEqual(session.bind.pool.checkedout(), 0)
+        self.assertEqual(self.query("select count(*) from pg_cursors"), [(0,)])
+
+    def write_records(self, writer_class, records, fn="input.tsv"):
+        """write records to fn in tmpdir, gzipped if fn ends with .gz"""
+        path = os.path.join(self.tmpdir, fn)
+        with (gzip.open(path, "w") if fn.endswith(".gz") else open(path, "w")) as fh:
+            w = writer_class(fh)
+            for r in records:
+                w.write(r)
+        return path
+
+    def run_loader(self, loader, session, opts):
+        """run loader; return its last log message (the final counts);
+        all messages are kept in self.messages"""
+        h = _LogCapture()
+        ul.logger.addHandler(h)
+        ul.logger.setLevel(logging.INFO)
+        self.messages = h.messages
+        try:
+            loader(session, opts, self.cf)
+        finally:
+            ul.logger.removeHandler(h)
+        return h.messages[-1]
+
+    def query(self, sql, **params):
+        session = self.connect()
+        try:
+            return [tuple(r) for r in session.execute(sql, params)]
+        finally:
+            session.close()
+
+    def exon_sets(self):
+        return self.query("""
+        select ES.tx_ac, ES.alt_ac, ES.alt_aln_method, ES.alt_strand,
+               string_agg(E.start_i || ',' || E.end_i || ',' || E.ord, ';' order by E.ord)
+        from exon_set ES join exon E on E.exon_set_id = ES.exon_set_id
+        group by ES.exon_set_id
+        order by 1, 2, 3
+        """)
+
+
+class _DictSeqFetcher(object):
+    """fetches from a dict of sequences, counting fetches; fetches
+    after the first fail_after raise exc"""
+
+    def __init__(self, seqs, fail_after=None, exc=RuntimeError):
+        self.seqs = seqs
+        self.fail_after = fail_after
+        self.exc = exc
+        self.n_fetched = 0
+
+    def fetch(self, ac, start_i=None, end_i=None):
+        self.n_fetched += 1
+        if self.fail_after is not None and self.n_fetched > self.fail_after:
+            raise self.exc("sequence source failed")
+        return self.seqs[ac][start_i:end_i]
+
+    def __getitem__(self, ac):
+        return self.fetch(ac)
+
+
+def _aln_counts(msg):
+    """return (n_ungapped, n_aligned, n_hit, n_miss) from align_exons' last message"""
+    m = re.search(r"(\d+)/(\d+) ungapped/aligned; cache (\d+)/(\d+) hit/miss", msg)
+    return tuple(int(v) for v in m.groups())
+
+
+class Test_uta_loading_align_exons(LoadingTestBase):
+    """align_exons over synthetic transcripts, whose exons are copies of
+    genomic exons that are identical, have one or two substitutions,
+    or lack a base; NM_9999.1 has no sequence"""
+
+    n_tx = 200
+    n_exons = 10
+
+    def setUp(self):
+        super(Test_uta_loading_align_exons, self).setUp()
+        self.cf = configparser.ConfigParser()
+        self.cf.read_dict({"uta": {"admin_role": "postgres"}, "loading": {}, "sequences": {}})
+        self.seqs, self.exon_sets = self._make_transcripts()
+        self.sf = _DictSeqFetcher(self.seqs)
+        self._get_seqfetcher = ul._get_seqfetcher
+        ul._get_seqfetcher = lambda cf: self.sf
+
+    def tearDown(self):
+        ul._get_seqfetcher = self._get_seqfetcher
+        super(Test_uta_loading_align_exons, self).tearDown()
+
+    def _make_transcripts(self):
+        """return seqs, a dict of ac -> sequence, and exon_sets, a list
+        of (tx_ac, strand, [(tx_start_i, tx_end_i, alt_start_i, alt_end_i)])
+        with exons in transcript order"""
+        rng = random.Random(0)
+        genome = "".join(rng.choice("ACGT") for _ in range(self.n_tx * 1000))
+        seqs = {"NC_1.1": genome}
+        exon_sets = []
+        for i_tx in range(self.n_tx + 1):
+            tx_ac = "NM_{:04d}.1".format(i_tx) if i_tx < self.n_tx else "NM_9999.1"
+            strand = 1 if i_tx % 2 else -1
+            alt_exons = []
+            p = i_tx * 1000 if i_tx < self.n_tx else 0
+            for i_ex in range(self.n_exons if i_tx < self.n_tx else 1):
+                p += rng.randint(20, 50)
+                alt_exons.append((p, p + rng.randint(20, 40)))
+                p = alt_exons[-1][1]
+            if strand == -1:
+                alt_exons.reverse()
+            tx_seq = ""
+            exons = []
+            for i_ex, (s, e) in enumerate(alt_exons):
+                ex_seq = list(genome[s:e] if strand == 1 else reverse_complement(genome[s:e]))
+                for _ in range(i_ex % 4 if i_ex % 4 < 3 else 0):
+                    j = rng.randrange(len(ex_seq))
+                    ex_seq[j] = "A" if ex_seq[j] != "A" else "C"
+                if i_ex % 4 == 3:
+                    del ex_seq[rng.randrange(len(ex_seq))]
+                exons.append((len(tx_seq), len(tx_seq) + len(ex_seq), s, e))
+                tx_seq += "".join(ex_seq)
+            if i_tx < self.n_tx:
+                seqs[tx_ac] = tx_seq
+            exon_sets.append((tx_ac, strand, exons))
+        return seqs, exon_sets
+
+    def load_fixture(self):
+        session = self.reset_db()
+        self.load_views()
+        # as sql/drop-seqs.sql does for loading databases
+        session.execute("alter table exon_aln alter column tx_aseq drop not null")
+        session.execute("alter table exon_aln alter column alt_aseq drop not null")
+        for tx_ac, strand, exons in self.exon_sets:
+            session.add(usam.Transcript(ac=tx_ac, origin_id=1, hgnc="G"))
+            session.flush()
+            ul._add_exon_set(session, tx_ac, tx_ac, 1, "transcript",
+                             ";".join("{},{}".format(ts, te) for ts, te, _, _ in exons))
+            ul._add_exon_set(session, tx_ac, "NC_1.1", strand, "splign",
+                             ";".join("{},{}".format(s, e) for _, _, s, e in exons))
+        session.commit()
+        return session
+
+    def expected_exon_alns(self):
+        """(tx_ac, ord, cigar) for each aligned exon pair, as aligned
+        one at a time with needleman_wunsch_gotoh_align"""
+        rows = []
+        for tx_ac, strand, exons in self.exon_sets:
+            if tx_ac not in self.seqs:
+                continue
+            for i_ex, (ts, te, s, e) in enumerate(exons):
+                alt_seq = self.seqs["NC_1.1"][s:e]
+                if strand == -1:
+                    alt_seq = reverse_complement(alt_seq)
+                score, cigar = utaaa.needleman_wunsch_gotoh_align(
+                    str(self.seqs[tx_ac][ts:te]), str(alt_seq), extended_cigar=True)
+                rows.append((tx_ac, i_ex, cigar.to_string()))
+        return rows
+
+    def exon_alns(self):
+        return self.query("""
+        select TES.tx_ac, TE.ord, EA.cigar
+        from exon_aln EA
+        join exon TE on TE.exon_id = EA.tx_exon_id
+        join exon_set TES on TES.exon_set_id = TE.exon_set_id
+        order by 1, 2
+        """)
+
+    def align(self, opts={}):
+        session = self.load_fixture()
+        msg = self.run_loader(ul.align_exons, session, opts)
+        return msg, self.exon_alns()
+
+    def test_workers_match_serial(self):
+        msg, exon_alns = self.align()
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        self.assertEqual(self.align({"--workers": "2"}), (msg, exon_alns))
+
+    def test_commits_while_streaming(self):
+        # the pair cursor is held open across the commit after 1000 pairs
+        msg, exon_alns = self.align()
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        self.assertEqual([m.split(";")[0] for m in self.messages if "committed" in m],
+                         ["1000/2001 50.0%"])
+        self.assertEqual(self.query("select count(*) from pg_cursors"), [(0,)])
+        self.assertEqual(self.query("select count(*) from meta where key like 'align-exons%'"), [(0,)])
+
+    def test_prefetch(self):
+        # each transcript and the genomic window spanning its exons are
+        # fetched once; the transcript without sequence is tried twice
+        # (prefetch and fetch), and its genomic window once
+        msg, exon_alns = self.align()
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        self.assertEqual(self.sf.n_fetched, 2 * self.n_tx + 3)
+
+    def test_prefetch_across_batches(self):
+        # with 7 exons per transcript, exon sets would straddle batches of
+        # 250 pairs; batches hold whole exon sets, so fetches are as above
+        self.n_exons = 7
+        self.seqs, self.exon_sets = self._make_transcripts()
+        self.sf = _DictSeqFetcher(self.seqs)
+        msg, exon_alns = self.align()
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        self.assertEqual(self.sf.n_fetched, 2 * self.n_tx + 3)
+
+    def test_shards(self):
+        session = self.load_fixture()
+        n_rows = []
+        for shard in ["1/2", "2/2"]:
+            self.run_loader(ul.align_exons, session, {"--shard": shard})
+            n_rows.append(len(self.exon_alns()))
+        self.assertEqual(self.exon_alns(), self.expected_exon_alns())
+        self.assertTrue(0 < n_rows[0] < n_rows[1])
+        for shard in ["0/2", "3/2", "1-2"]:
+            with self.assertRaises(UTAError):
+                ul.align_exons(session, {"--shard": shard}, self.cf)
+
+    def checkpoint(self):
+        return self.query("select key, value from meta where key like 'align-exons%'")
+
+    def test_resume_after_interrupt(self):
+        # the pairs of two batches (of 250) are aligned, with 100
+        # fetches, and committed on interrupt
+        session = self.load_fixture()
+        self.sf.fail_after, self.sf.exc = 100, KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_loader(ul.align_exons, session, {"--shard": "1/1"})
+        self.assertConnectionReleased(session)
+        self.assertEqual(len(self.exon_alns()), 500)
+        self.assertEqual(self.checkpoint(), [("align-exons checkpoint 1/1", "NM_0049.1")])
+
+        self.sf.fail_after = None
+        self.run_loader(ul.align_exons, session, {"--shard": "1/1"})
+        self.assertIn("resuming from checkpoint at NM_0049.1", self.messages)
+        self.assertEqual(self.exon_alns(), self.expected_exon_alns())
+        self.assertEqual(self.checkpoint(), [])
+
+    def test_resume_after_error(self):
+        # fetches for the sixth batch fail, after the commit at 1000 pairs
+        session = self.load_fixture()
+        self.sf.fail_after = 260
+        with self.assertRaises(RuntimeError):
+            self.run_loader(ul.align_exons, session, {})
+        self.assertConnectionReleased(session)
+        self.assertEqual(len(self.exon_alns()), 1001)
+        self.assertEqual(self.checkpoint(), [("align-exons checkpoint", "NM_0100.1")])
+
+        self.sf.fail_after = None
+        self.run_loader(ul.align_exons, session, {})
+        self.assertIn("resuming from checkpoint at NM_0100.1", self.messages)
+        self.assertEqual(self.exon_alns(), self.expected_exon_alns())
+        self.assertEqual(self.checkpoint(), [])
+
+    def test_error_with_workers(self):
+        # worker processes are terminated and the connection released
+        session = self.load_fixture()
+        self.sf.fail_after = 100
+        with self.assertRaises(RuntimeError):
+            self.run_loader(ul.align_exons, session, {"--workers": "2"})
+        self.assertEqual(multiprocessing.active_children(), [])
+        self.assertConnectionReleased(session)
+
+    def test_ungapped(self):
+        # exactly the pairs whose alignment has no gaps and at most one
+        # mismatch take the fast path, with the same cigars
+        msg, exon_alns = self.align()
+        expected = self.expected_exon_alns()
+        self.assertEqual(exon_alns, expected)
+        n_ungapped = sum(1 for _, _, cigar in expected if re.match(r"^(\d+=)?(1X)?(\d+=)?$", cigar))
+        self.assertEqual(_aln_counts(msg)[:2], (n_ungapped, len(expected) - n_ungapped))
+        self.assertTrue(0 < n_ungapped < len(expected))
+
+    def test_aln_cache(self):
+        # gapped pairs are cached on the first run and read back on the second
+        self.cf.read_dict({"loading": {"exon_aln_cache": os.path.join(self.tmpdir, "exon-aln-cache.sqlite3")}})
+        msg, exon_alns = self.align()
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        n_ungapped, n_aligned, n_hit, n_miss = _aln_counts(msg)
+        self.assertEqual((n_hit, n_miss), (0, n_aligned))
+        msg, exon_alns = self.align({"--workers": "2"})
+        self.assertEqual(exon_alns, self.expected_exon_alns())
+        self.assertEqual(_aln_counts(msg), (n_ungapped, n_aligned, n_aligned, 0))
+
+
+class Test_uta_loading_exonset(LoadingTestBase):
+
+    existing = [
+        ("NM_1.1", "NC_1.1", "splign", 1, "100,200;300,400"),
+        ("NM_2.1", "NC_1.1", "splign", -1, "300,400;100,200"),
+    ]
+
+    records = [
+        ufes.ExonSet("NM_1.1", "NC_1.1", "splign", "1", "100,200;300,400"),     # unchanged
+        ufes.ExonSet("NM_2.1", "NC_1.1", "splign", "-1", "300,450;100,200"),    # changed
+        ufes.ExonSet("NM_3.1", "NC_1.1", "splign", "1", "500,600"),             # new
+        ufes.ExonSet("NM_3.1", "NC_1.1", "splign", "1", "500,600"),             # repeated, unchanged
+        ufes.ExonSet("NM_2.1", "NC_1.1", "splign", "-1", "300,460;100,200"),    # repeated, changed again
+        ufes.ExonSet("NM_3.1", "NC_1.1", "splign", "1", "500,650"),             # repeated, changed
+        ufes.ExonSet("NM_2.1", "NC_1.1", "splign", "-1", "300,450;100,200"),    # back to an archived exon set
+        ufes.ExonSet("NM_3.1", "NC_2.1", "blat", "-1", "900,990;700,800"),      # new
+    ]
+
+    def _reset_exon_sets(self):
+        session = self.reset_db()
+        for tx_ac in ["NM_1.1", "NM_2.1", "NM_3.1"]:
+            session.add(usam.Transcript(ac=tx_ac, origin_id=1, hgnc="G"))
+        session.flush()
+        for tx_ac, alt_ac, method, strand, ess in self.existing:
+            ul._add_exon_set(session, tx_ac, alt_ac, strand, method, ess)
+        session.commit()
+        return session
+
+    def _load(self, bulk, fn="input.tsv"):
+        session = self._reset_exon_sets()
+        fn = self.write_records(ufes.ExonSetWriter, self.records, fn)
+        msg = self.run_loader(ul.load_exonset, session, {"FILE": fn, "--bulk": bulk})
+        return msg, self.exon_sets()
+
+    def test_bulk_matches_per_row(self):
+        msg, exon_sets = self._load(bulk=False)
+        self.assertIn("2 new, 2 unchanged, 4 deprecated, 0 n_errors", msg)
+        self.assertEqual(len(exon_sets), 8)
+        bulk_msg, bulk_exon_sets = self._load(bulk=True)
+        self.assertEqual(bulk_msg, msg)
+        self.assertEqual(bulk_exon_sets, exon_sets)
+
+    def test_gzip_input(self):
+        msg, exon_sets = self._load(bulk=False)
+        for bulk in [False, True]:
+            self.assertEqual(self._load(bulk, "input.tsv.gz"), (msg, exon_sets))
+
+    def _upsert(self, indexed):
+        session = self._reset_exon_sets()
+        es_index = ul._fetch_exon_set_index(session) if indexed else None
+        results = []
+        for es in self.records:
+            n, o = ul._upsert_exon_set_record(session, es.tx_ac, es.alt_ac, es.strand, es.method,
+                                              es.exons_se_i, es_index=es_index)
+            session.commit()
+            results.append((n is not None, o is not None))
+        return results, self.exon_sets()
+
+    def test_index_matches_queries(self):
+        results, exon_sets = self._upsert(indexed=False)
+        self.assertEqual(results, [(False, True), (True, True), (True, False), (False, True),
+                                   (True, True), (True, True), (True, True), (True, False)])
+        self.assertEqual(self._upsert(indexed=True), (results, exon_sets))
+
+
+class Test_uta_loading_txinfo(LoadingTestBase):
+
+    existing = [
+        ("NM_1.1", 10, 40, "0,100;100,250"),
+        ("NM_2.1", None, None, "0,300"),
+        ("NM_3.1", 5, 50, "0,120"),
+    ]
+
+    records = [
+        ufti.TxInfo("test", "NM_1.1", "G", "10,40", "0,100;100,250"),     # unchanged
+        ufti.TxInfo("test", "NM_2.1", "G", "", "0,150;150,300"),          # exons changed
+        ufti.TxInfo("test", "NM_3.1", "G", "6,50", "0,120"),              # cds changed
+        ufti.TxInfo("test", "NM_4.1", "G", "20,80", "0,50;50,200"),       # new, coding
+        ufti.TxInfo("test", "NM_5.1", "H", "", "0,90"),                   # new, non-coding
+        ufti.TxInfo("test", "NM_6.1", "H", "", ""),                       # no exons
+        ufti.TxInfo("test", "NM_1.1", "H", "10,40", "0,100;100,250"),     # hgnc changed
+        ufti.TxInfo("test", "NM_4.1", "G", "20,80", "0,60;60,200"),       # new, then exons changed
+        ufti.TxInfo("test", "NM_2.1", "G", "", "0,300"),                  # exons changed back
+    ]
+
+    def setUp(self):
+        super(Test_uta_loading_txinfo, self).setUp()
+        rng = random.Random(0)
+        seqs = {ac: "".join(rng.choice("ACGT") for _ in range(300)) for ac in ["NM_3.1", "NM_4.1"]}
+        self._get_seqfetcher = ul._get_seqfetcher
+        ul._get_seqfetcher = lambda cf: _DictSeqFetcher(seqs)
+
+    def tearDown(self):
+        ul._get_seqfetcher = self._get_seqfetcher
+        super(Test_uta_loading_txinfo, self).tearDown()
+
+    def _load(self, opts, records=None):
+        session = self.reset_db()
+        for tx_ac, cds_start_i, cds_end_i, ess in self.existing:
+            session.add(usam.Transcript(ac=tx_ac, origin_id=1, hgnc="G", cds_start_i=cds_start_i,
+                                        cds_end_i=cds_end_i, cds_md5="x" * 32 if cds_start_i else None))
+            session.flush()
+            ul._add_exon_set(session, tx_ac, tx_ac, 1, "transcript", ess)
+        session.commit()
+        opts = dict(opts, FILE=self.write_records(ufti.TxInfoWriter, records or self.records))
+        msg = self.run_loader(ul.load_txinfo, session, opts)
+        return msg, self.query("""
+        select ac, hgnc, cds_start_i, cds_end_i, cds_md5 from transcript order by ac
+        """), self.exon_sets()
+
+    def test_bulk_matches_per_row(self):
+        msg, txs, exon_sets = self._load({})
+        self.assertEqual(msg, "9/9 100.0%; 3 new, 2 unchanged, 1 cds changed, 3 exons changed; commited")
+        self.assertEqual([tx[:4] for tx in txs], [
+            ("NM_1.1", "H", 10, 40), ("NM_2.1", "G", None, None), ("NM_3.1", "G", 6, 50),
+            ("NM_3.1/5..50", "G", 5, 50), ("NM_4.1", "G", 20, 80), ("NM_5.1", "H", None, None)])
+        self.assertEqual(len(exon_sets), 9)
+        self.assertEqual(self._load({"--bulk": True}), (msg, txs, exon_sets))
+        self.assertEqual(self._load({"--bulk": True, "--workers": "2"}), (msg, txs, exon_sets))
+
+    def test_bulk_hgnc_then_cds_changed(self):
+        # the renamed transcript keeps the HGNC symbol set before the rename
+        records = [
+            ufti.TxInfo("test", "NM_3.1", "H", "5,50", "0,120"),          # hgnc changed
+            ufti.TxInfo("test", "NM_3.1", "K", "6,50", "0,120"),          # cds changed
+        ]
+        msg, txs, exon_sets = self._load({}, records)
+        self.assertEqual([tx[:4] for tx in txs if tx[0].startswith("NM_3.1")], [
+            ("NM_3.1", "K", 6, 50), ("NM_3.1/5..50", "H", 5, 50)])
+        self.assertEqual(self._load({"--bulk": True}, records), (msg, txs, exon_sets))
+
+    def test_bulk_invalid_exons_not_archived(self):
+        session = self.reset_db()
+        session.add(usam.Transcript(ac="NM_1.1", origin_id=1, hgnc="G"))
+        session.flush()
+        ul._add_exon_set(session, "NM_1.1", "NM_1.1", 1, "transcript", "0,100;100,250")
+        session.commit()
+        fn = self.write_records(ufti.TxInfoWriter, [
+            ufti.TxInfo("test", "NM_1.1", "G", "", "0,100;250,100"),     # changed, malformed
+        ])
+        msg = self.run_loader(ul.load_txinfo, session, {"FILE": fn, "--bulk": True})
+        self.assertIn("0 new, 0 unchanged, 0 cds changed, 0 exons changed", msg)
+        self.assertEqual(self.exon_sets(), [("NM_1.1", "NM_1.1", "transcript", 1, "0,100,0;100,250,1")])
+
+
+def _gi(hgnc, summary, aliases=["X"]):
+    return ufgi.GeneInfo("1", "9606", hgnc, "1p1", aliases, "protein-coding", summary, hgnc + " gene", ["x:1"])
+
+
+class Test_uta_loading_geneinfo(LoadingTestBase):
+
+    existing = [_gi("D", "d"), _gi("E", "e")]
+
+    records = [
+        _gi("A", "a"),                                  # new
+        _gi("B", "b", ["B 1", 'B"2', "{B3}", ""]),      # new, aliases needing quotes
+        _gi("C", "c1"),                                 # new, repeated
+        _gi("D", "d"),                                  # unchanged
+        _gi("E", "e2"),                                 # changed
+        _gi("C", "c2"),                                 # last row wins
+    ]
+
+    def _merge(self, session, records):
+        """load records one at a time with session.merge, as load_geneinfo once did"""
+        with open(self.write_records(ufgi.GeneInfoWriter, records, "merge.tsv")) as fh:
+            for gi in ufgi.GeneInfoReader(fh):
+                session.merge(usam.Gene(hgnc=gi.hgnc, maploc=gi.maploc, descr=gi.descr, summary=gi.summary,
+                                        aliases=gi.aliases))
+        session.commit()
+
+    def genes(self):
+        return self.query("select hgnc, maploc, descr, summary, aliases from gene order by hgnc")
+
+    def test_load_matches_merge(self):
+        session = self.reset_db()
+        self._merge(session, self.existing + self.records)
+        expected = self.genes()
+
+        session = self.reset_db()
+        self._merge(session, self.existing)
+        fn = self.write_records(ufgi.GeneInfoWriter, self.records)
+        msg = self.run_loader(ul.load_geneinfo, session, {"FILE": fn})
+        self.assertEqual(msg, "6 rows, 5 genes; 3 new, 1 changed, 1 unchanged")
+        self.assertEqual(self.genes(), expected)
+
+        msg = self.run_loader(ul.load_geneinfo, session, {"FILE": fn})
+        self.assertEqual(msg, "6 rows, 5 genes; 0 new, 0 changed, 5 unchanged")
+        self.assertEqual(self.genes(), expected)
+
+
+class Test_uta_loading_seqinfo(LoadingTestBase):
+
+    seqs = {"NM_1.1": "ACGTACGT", "NM_2.1": "CCCCGGGG", "XM_2.1": "CCCCGGGG",
+            "NM_3.1": "TTTTAAAA", "NM_4.1": "acgtaaaa"}
+    md5s = {ac: seq_md5(seq) for ac, seq in seqs.items()}
+
+    records = [
+        ufsi.SeqInfo(md5s["NM_1.1"], "test", "NM_1.1", "new descr", "8", ""),  # descr updated
+        ufsi.SeqInfo(md5s["NM_1.1"], "test", "NM_1.2", "", "8", ""),           # descr kept
+        ufsi.SeqInfo(md5s["NM_2.1"], "test", "NM_2.1", "two", "8", ""),        # new sequence
+        ufsi.SeqInfo(md5s["NM_2.1"], "test", "XM_2.1", "two", "8", ""),        # new, same sequence
+        ufsi.SeqInfo(md5s["NM_3.1"], "test", "NM_3.1", "three", "9", ""),      # wrong length
+        ufsi.SeqInfo(md5s["NM_4.1"], "test", "NM_4.1", "four", "8", ""),       # new sequence
+    ]
+
+    def setUp(self):
+        super(Test_uta_loading_seqinfo, self).setUp()
+        self.sf = _DictSeqFetcher(self.seqs)
+        self._get_seqfetcher = ul._get_seqfetcher
+        ul._get_seqfetcher = lambda cf: self.sf
+
+    def tearDown(self):
+        ul._get_seqfetcher = self._get_seqfetcher
+        super(Test_uta_loading_seqinfo, self).tearDown()
+
+    def load(self, session, records):
+        fn = self.write_records(ufsi.SeqInfoWriter, records)
+        return self.run_loader(ul.load_seqinfo, session, {"FILE": fn})
+
+    def tables(self):
+        return (self.query("select seq_id, len, seq from seq order by seq_id"),
+                self.query("select seq_id, ac, descr from seq_anno order by ac"))
+
+    def test_load(self):
+        session = self.reset_db()
+        session.add(usam.Seq(seq_id=self.md5s["NM_1.1"], len=8, seq="ACGTACGT"))
+        session.add(usam.SeqAnno(seq_id=self.md5s["NM_1.1"], origin_id=1, ac="NM_1.1", descr="old"))
+        session.add(usam.SeqAnno(seq_id=self.md5s["NM_1.1"], origin_id=1, ac="NM_1.2", descr="kept"))
+        session.commit()
+
+        msg = self.load(session, self.records)
+        self.assertEqual(msg, "3 annotations created, 1 updated; 2 sequences created, 1 skipped/4 sequences total")
+        tables = self.tables()
+        self.assertEqual(tables, (
+            sorted([(self.md5s["NM_1.1"], 8, "ACGTACGT"), (self.md5s["NM_2.1"], 8, "CCCCGGGG"),
+                    (self.md5s["NM_4.1"], 8, "ACGTAAAA")]),
+            [(self.md5s["NM_1.1"], "NM_1.1", "new descr"), (self.md5s["NM_1.1"], "NM_1.2", "kept"),
+             (self.md5s["NM_2.1"], "NM_2.1", "two"), (self.md5s["NM_4.1"], "NM_4.1", "four"),
+             (self.md5s["NM_2.1"], "XM_2.1", "two")]))
+        # one fetch per new md5
+        self.assertEqual(self.sf.n_fetched, 3)
+
+        msg = self.load(session, self.records)
+        self.assertEqual(msg, "0 annotations created, 0 updated; 0 sequences created, 1 skipped/4 sequences total")
+        self.assertEqual(self.tables(), tables)
+
+        # an accession may not change sequence
+        with self.assertRaises(RuntimeError):
+            self.load(session, [ufsi.SeqInfo(self.md5s["NM_2.1"], "test", "NM_1.1", "", "8", "")])
+        session.rollback()
+        self.assertEqual(self.tables(), tables)
+
+
+class _FakeSeqFetcher(object):
+    """returns ACGT, except that NM_2.1 is too short, NM_3.1 is
+    missing, and fetches after the first fail_after fail"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.n_fetched = 0
+
+    def fetch(self, ac, start_i=None, end_i=None):
+        self.n_fetched += 1
+        if self.fail_after is not None and self.n_fetched > self.fail_after:
+            raise RuntimeError("sequence source failed")
+        if ac == "NM_3.1":
+            raise KeyError(ac)
+        return ("ac" if ac == "NM_2.1" else "acgt")[start_i:end_i]
+
+
+class Test_uta_loading_sequences(LoadingTestBase):
+
+    def setUp(self):
+        super(Test_uta_loading_sequences, self).setUp()
+        self._get_seqfetcher = ul._get_seqfetcher
+        ul._get_seqfetcher = lambda cf: _FakeSeqFetcher()
+
+    def tearDown(self):
+        ul._get_seqfetcher = self._get_seqfetcher
+        super(Test_uta_loading_sequences, self).tearDown()
+
+    def test_nothing_to_load(self):
+        session = self.reset_db()
+        msg = self.run_loader(ul.load_sequences, session, {})
+        self.assertEqual(msg, "no sequences to load")
+        self.assertConnectionReleased(session)
+
+    def add_seqs(self, session, acs):
+        for i, ac in enumerate(acs, 1):
+            seq_id = "s{}".format(i)
+            session.add(usam.Seq(seq_id=seq_id, len=4))
+            session.add(usam.SeqAnno(seq_id=seq_id, origin_id=1, ac=ac))
+        session.commit()
+
+    def test_load(self):
+        session = self.reset_db()
+        self.add_seqs(session, ["NM_1.1", "NM_2.1", "NM_3.1"])
+        msg = self.run_loader(ul.load_sequences, session, {"--commit-interval": "2"})
+        self.assertEqual(msg, "1 sequences loaded (0.0 MB); 2 errors")
+        self.assertEqual(self.query("select seq_id, seq from seq order by seq_id"),
+                         [("s1", "ACGT"), ("s2", None), ("s3", None)])
+        self.assertConnectionReleased(session)
+
+    def test_workers_match_serial(self):
+        # several batches (of 100) and commits, with the held cursor open
+        acs = ["NM_2.1", "NM_3.1"] + ["NM_1{:03d}.1".format(i) for i in range(250)]
+        results = []
+        for opts in [{}, {"--workers": "2"}]:
+            session = self.reset_db()
+            self.add_seqs(session, acs)
+            opts = dict(opts, **{"--commit-interval": "50"})
+            msg = self.run_loader(ul.load_sequences, session, opts)
+            results.append((msg, self.query("select seq_id, seq from seq order by seq_id")))
+            self.assertConnectionReleased(session)
+        self.assertEqual(results[0][0], "250 sequences loaded (0.0 MB); 2 errors")
+        self.assertEqual(results[1], results[0])
+
+    def test_error_releases_cursor(self):
+        session = self.reset_db()
+        # the first batch (of 100) is committed, and the second fails
+        ul._get_seqfetcher = lambda cf: _FakeSeqFetcher(fail_after=100)
+        self.add_seqs(session, ["NM_1{:02d}.1".format(i) for i in range(101)])
+        with self.assertRaises(RuntimeError):
+            self.run_loader(ul.load_sequences, session, {"--commit-interval": "1"})
+        self.assertEqual(self.query("select count(seq) from seq"), [(100,)])
+        self.assertConnectionReleased(session)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
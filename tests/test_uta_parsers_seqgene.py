@@ -1,8 +1,12 @@
 import gzip
+import itertools
 import os
+import shutil
+import tempfile
 import unittest
 
 import uta.parsers.seqgene
+from uta.exceptions import UTAError
 
 data_dir = os.path.realpath(
     os.path.realpath(os.path.join(__file__, '../data')))
@@ -35,6 +39,86 @@ class Test_parsers_seqgene(unittest.TestCase):
             'transcript': '-'})
 
 
+class _ReadCountingGzipFile(gzip.GzipFile):
+    """GzipFile that counts lines read"""
+
+    n_read = 0
+
+    def next(self):
+        line = gzip.GzipFile.next(self)
+        self.n_read += 1
+        return line
+
+
+class Test_parsers_seqgene_blocks(unittest.TestCase):
+
+    fn = os.path.join(data_dir, 'seq_gene10k.md.gz')
+
+    def _expected(self):
+        recs = sorted(uta.parsers.seqgene.SeqGeneParser(gzip.open(self.fn)),
+                      key=uta.parsers.seqgene._rec_key)
+        return [(k[0], k[1], list(g))
+                for k, g in itertools.groupby(recs, key=uta.parsers.seqgene._block_key)]
+
+    def test_in_memory(self):
+        blocks = list(uta.parsers.seqgene.SeqGeneBlockParser(gzip.open(self.fn)))
+        self.assertEqual(blocks, self._expected())
+
+    def test_external_sort(self):
+        blocks = list(uta.parsers.seqgene.SeqGeneBlockParser(
+            gzip.open(self.fn), max_records=1000))
+        self.assertEqual(blocks, self._expected())
+
+    def test_presorted(self):
+        expected = self._expected()
+        lines = gzip.open(self.fn).readlines()
+        header, body = lines[0], lines[1:]
+        body.sort(key=lambda l: tuple(l.split('\t')[i] for i in (13, 12)))
+        blocks = list(uta.parsers.seqgene.SeqGeneBlockParser(
+            iter([header] + body), presorted=True))
+        self.assertEqual(blocks, expected)
+
+    def test_external_sort_missing_fields(self):
+        # short lines yield None for missing fields, which must survive runs on disk
+        lines = gzip.open(self.fn).readlines()
+        lines[1:] = [l.rsplit('\t', 1)[0] + '\n' if i % 3 == 0 else l for i, l in enumerate(lines[1:])]
+        in_memory = list(uta.parsers.seqgene.SeqGeneBlockParser(iter(lines)))
+        external = list(uta.parsers.seqgene.SeqGeneBlockParser(iter(lines), max_records=1000))
+        self.assertIn(None, [r['evidence_code'] for _, _, recs in in_memory for r in recs])
+        self.assertEqual(external, in_memory)
+
+    def test_sorted_input_streamed(self):
+        # sorted plain files are scanned and streamed; gzip files are
+        # not scanned, so are sorted unless presorted=True
+        lines = gzip.open(self.fn).readlines()
+        header, body = lines[0], lines[1:]
+        body.sort(key=lambda l: tuple(l.split('\t')[i] for i in (13, 12)))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(tmpdir, 'seq_gene.md')
+            with open(fn, 'wb') as fh:
+                fh.writelines([header] + body)
+            parser = uta.parsers.seqgene.SeqGeneBlockParser(open(fn))
+            self.assertTrue(parser._presorted)
+            self.assertEqual(list(parser), self._expected())
+
+            with gzip.open(fn + '.gz', 'wb') as fh:
+                fh.writelines([header] + body)
+            fh = _ReadCountingGzipFile(fn + '.gz')
+            parser = uta.parsers.seqgene.SeqGeneBlockParser(fh)
+            self.assertFalse(parser._presorted)
+            self.assertEqual(list(parser), self._expected())
+            self.assertEqual(fh.n_read, len(lines))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_presorted_out_of_order(self):
+        parser = uta.parsers.seqgene.SeqGeneBlockParser(
+            gzip.open(self.fn), presorted=True)
+        with self.assertRaises(UTAError):
+            list(parser)
+
+
 if __name__ == '__main__':
     unittest.main()
 
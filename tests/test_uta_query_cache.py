@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from uta.query_cache import LRUCache, LayeredCache, SQLiteCache, make_cache
+
+
+class Test_uta_query_cache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, "query-cache.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_lru(self):
+        cache = LRUCache(maxsize=2)
+        cache.put(("a",), 1)
+        cache.put(("b",), None)
+        self.assertEqual(cache.get(("a",)), 1)      # a is now most recent
+        cache.put(("c",), 3)                        # evicts b
+        self.assertEqual(cache.get(("b",), "miss"), "miss")
+        self.assertEqual(cache.get(("a",)), 1)
+        self.assertEqual(cache.get(("c",)), 3)
+        self.assertEqual(cache.cache_info(), (3, 1, 2, 2))
+
+    def test_sqlite_persistence(self):
+        cache = SQLiteCache(self.path)
+        cache.put(("tx", 1), [{"tx_ac": "NM_1.1", "start_i": 1}])
+        cache.put(("tx", "1"), [])
+        cache.close()
+
+        cache = SQLiteCache(self.path)
+        self.assertEqual(cache.get(("tx", 1)), [{"tx_ac": "NM_1.1", "start_i": 1}])
+        self.assertEqual(cache.get(("tx", "1")), [])
+        self.assertIsNone(cache.get(("tx", 2)))
+        self.assertEqual(len(cache), 2)
+        cache.close()
+
+    def test_layered(self):
+        make_cache(path=self.path).put(("k",), "v")
+        cache = make_cache(maxsize=10, path=self.path)
+        self.assertIsInstance(cache, LayeredCache)
+        lru = cache.layers[0]
+        self.assertNotIn(("k",), lru)
+        self.assertEqual(cache.get(("k",)), "v")
+        self.assertIn(("k",), lru)                  # promoted
+        self.assertEqual(cache.get(("x",), "miss"), "miss")
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bioutils.digests import seq_md5
+
+from uta.seq_digests import SeqDigestCache, seqrepo_md5_len, streamed_md5_len
+
+
+class _FakeSeqRepo(object):
+    """minimal stand-in for biocommons.seqrepo.SeqRepo without metadata"""
+
+    def __init__(self, seqs):
+        self.seqs = seqs
+        self.n_fetched = 0
+
+    def fetch(self, ac, start=None, end=None):
+        seq = self.seqs[ac][start:end]
+        self.n_fetched += len(seq)
+        return seq
+
+    def __getitem__(self, ac):
+        return self.seqs[ac]
+
+
+class Test_uta_seq_digests(unittest.TestCase):
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self._tmpdir, "seq-digest-cache.sqlite3")
+        self.sr = _FakeSeqRepo({"NC_1.1": "acgtN" * 1001, "NM_1.1": "", "NM_2.1": "ACGTACGT",
+                                "NM_4.1": "AC GT\nac\tgt ", "NP_1.1": "MAL*"})
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def test_streamed(self):
+        for ac, seq in self.sr.seqs.items():
+            for chunk_size in (1, 7, 5005, 5006, 100000):
+                self.assertEqual(streamed_md5_len(self.sr, ac, chunk_size=chunk_size),
+                                 (seq_md5(seq), len(seq)))
+
+    def test_not_found(self):
+        with self.assertRaises(KeyError):
+            seqrepo_md5_len(self.sr, "NM_3.1")
+
+    def test_cache(self):
+        cache = SeqDigestCache(self.path)
+        self.assertIsNone(cache.get("NC_1.1"))
+        self.assertEqual(seqrepo_md5_len(self.sr, "NC_1.1", cache=cache), (seq_md5("acgtN" * 1001), 5005))
+        cache.close()
+
+        self.sr.n_fetched = 0
+        cache = SeqDigestCache(self.path)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(seqrepo_md5_len(self.sr, "NC_1.1", cache=cache), (seq_md5("acgtN" * 1001), 5005))
+        self.assertEqual(self.sr.n_fetched, 0)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
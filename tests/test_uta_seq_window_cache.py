@@ -0,0 +1,100 @@
+import unittest
+
+from uta.seq_window_cache import SeqWindowCache
+
+
+class FakeFetcher(object):
+
+    def __init__(self, seqs):
+        self.seqs = seqs
+        self.n_fetches = 0
+
+    def fetch(self, ac, start_i=None, end_i=None):
+        self.n_fetches += 1
+        return self.seqs[ac][start_i:end_i]
+
+
+class Test_uta_seq_window_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.sf = FakeFetcher({
+            "NM_01": "ACGTACGTAC",
+            "NC_01": "GATTACA" * 100,
+            })
+
+    def test_fetch_without_prefetch(self):
+        swc = SeqWindowCache(self.sf)
+        self.assertEqual(swc.fetch("NM_01", 2, 5), "GTA")
+        self.assertEqual(swc.fetch("NM_01"), "ACGTACGTAC")
+        self.assertEqual(self.sf.n_fetches, 2)
+        self.assertEqual((swc.hits, swc.misses), (0, 2))
+        self.assertRaises(KeyError, swc.fetch, "NM_XX", 0, 1)
+
+    def test_prefetch_whole(self):
+        swc = SeqWindowCache(self.sf)
+        swc.prefetch("NM_01")
+        swc.prefetch("NM_01")
+        self.assertEqual(self.sf.n_fetches, 1)
+        self.assertEqual(swc.fetch("NM_01", 2, 5), "GTA")
+        self.assertEqual(swc.fetch("NM_01", 0, 10), "ACGTACGTAC")
+        self.assertEqual(swc.fetch("NM_01"), "ACGTACGTAC")
+        self.assertEqual(self.sf.n_fetches, 1)
+        self.assertEqual(swc.hits, 3)
+
+    def test_prefetch_window(self):
+        swc = SeqWindowCache(self.sf)
+        swc.prefetch("NC_01", 100, 200)
+        self.assertEqual(swc.fetch("NC_01", 110, 120), self.sf.seqs["NC_01"][110:120])
+        self.assertEqual(swc.fetch("NC_01", 100, 200), self.sf.seqs["NC_01"][100:200])
+        self.assertEqual(self.sf.n_fetches, 1)
+        # outside window is passed through
+        self.assertEqual(swc.fetch("NC_01", 190, 210), self.sf.seqs["NC_01"][190:210])
+        self.assertEqual(self.sf.n_fetches, 2)
+
+    def test_prefetch_truncated(self):
+        swc = SeqWindowCache(self.sf)
+        swc.prefetch("NM_01", 5, 50)
+        self.assertEqual(swc.fetch("NM_01", 5, 10), "CGTAC")
+        self.assertEqual(swc.fetch("NM_01", 5, 11), "CGTAC")
+        self.assertEqual((swc.hits, swc.misses), (1, 1))
+
+    def test_prefetch_unknown(self):
+        swc = SeqWindowCache(self.sf)
+        swc.prefetch("NM_XX")
+        self.assertEqual(swc.n_bytes, 0)
+
+    def test_eviction(self):
+        swc = SeqWindowCache(self.sf, max_bytes=250, max_window=150)
+        swc.prefetch("NC_01", 0, 100)
+        swc.prefetch("NC_01", 100, 200)
+        swc.fetch("NC_01", 0, 10)               # 0-100 now most recently used
+        swc.prefetch("NC_01", 200, 300)         # evicts 100-200
+        swc.prefetch("NC_01", 300, 500)         # exceeds max_window; ignored
+        self.assertEqual(swc.n_bytes, 200)
+        n = self.sf.n_fetches
+        swc.fetch("NC_01", 10, 20)
+        swc.fetch("NC_01", 210, 220)
+        self.assertEqual(self.sf.n_fetches, n)
+        swc.fetch("NC_01", 110, 120)
+        self.assertEqual(self.sf.n_fetches, n + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
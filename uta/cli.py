@@ -11,10 +11,10 @@ Usage:
   uta (-C CONF ...) [options] load-origin FILE
   uta (-C CONF ...) [options] load-seqinfo FILE
   uta (-C CONF ...) [options] load-geneinfo FILE
-  uta (-C CONF ...) [options] load-txinfo FILE
-  uta (-C CONF ...) [options] load-exonset FILE
-  uta (-C CONF ...) [options] load-sequences
-  uta (-C CONF ...) [options] align-exons [--sql SQL]
+  uta (-C CONF ...) [options] load-txinfo [--bulk] [--workers N] FILE
+  uta (-C CONF ...) [options] load-exonset [--bulk] FILE
+  uta (-C CONF ...) [options] load-sequences [--workers N] [--commit-interval N]
+  uta (-C CONF ...) [options] align-exons [--sql SQL] [--workers N] [--shard K/N]
   uta (-C CONF ...) [options] load-ncbi-seqgene FILE
   uta (-C CONF ...) [options] grant-permissions
   uta (-C CONF ...) [options] refresh-matviews
@@ -22,6 +22,10 @@ Usage:
   
 Options:
   -C CONF, --conf CONF	Configuration to read (required)
+  --workers N           Number of worker processes (align-exons, load-sequences, load-txinfo --bulk)
+  --commit-interval N   Commit every N sequences (load-sequences) [default: 1000]
+  --shard K/N           Align only shard K (1..N) of N, selected by hash of tx_ac
+  --bulk                Load with COPY and set-based SQL (load-exonset, load-txinfo)
 
 Examples:
   $ ./bin/uta --conf etc/uta.conf create-schema --drop-current
@@ -54,6 +58,7 @@ import docopt
 
 import uta
 import uta.loading as ul
+import uta.models as usam
 from uta.exceptions import UTAError
 
 
@@ -101,10 +106,6 @@ def main():
             cf_loaded[conf_fn] = True
             logger.info("loaded " + conf_fn)
 
-    db_url = cf.get("uta", "db_url")
-    logger.info("connecting to " + db_url)
-    session = uta.connect(db_url)
-
     sub = None
     for cmd, func in dispatch_table:
         if opts[cmd]:
@@ -112,6 +113,13 @@ def main():
             break
     if sub is None:
         raise UTAError("No valid actions specified")
+
+    # loading and maintenance commands run as admin_role; shell does
+    # not, and so doesn't require it in the configuration
+    db_url = cf.get("uta", "db_url")
+    role = None if cmd == "shell" else cf.get("uta", "admin_role")
+    logger.info("connecting to " + db_url)
+    session = uta.connect(db_url, schema=usam.schema_name, role=role)
     t0 = time.time()
     sub(session, opts, cf)
     logger.info("{cmd}: {elapsed:.1f}s elapsed".format(
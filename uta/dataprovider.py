@@ -0,0 +1,322 @@
+"""read-side access to transcripts and alignments in a UTA database
+
+UTADataProvider answers the queries that clients such as hgvs make of
+UTA, and caches results (see uta.query_cache), so that repeated
+queries for the same transcript, gene, or region reach the database
+only once::
+
+    from uta.query_cache import make_cache
+    dp = uta.dataprovider.connect(cache=make_cache(path="uta-cache.sqlite3"))
+    dp.get_tx_info("NM_000551.3", "NC_000003.11", "splign")
+
+Results are dicts (one per row) or lists of them, keyed by column
+name; each call returns new dicts, so callers may modify them without
+affecting cached results.  Cache keys include the database, schema name, and schema
+version, so a persistent cache may be shared among databases and
+survives only as long as the schema it was filled from.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+
+import sqlalchemy as sa
+
+from uta.exceptions import UTAError
+from uta.interval_index import NCList
+from uta.tools.parallel import chunks
+import uta
+import uta.models as usam
+
+logger = logging.getLogger(__name__)
+
+_missing = object()
+
+# array parameters of batch queries on PostgreSQL, one per key column
+_batch_params = ["tx_acs", "alt_acs", "alt_aln_methods"]
+
+# batch queries match (tx_ac, alt_ac, alt_aln_method) keys as tuples;
+# on PostgreSQL, the keys are passed as parallel arrays, so that the
+# statement is the same for any batch size
+_pg_in_keys = "in (select * from unnest({}))".format(
+    ", ".join("cast(:{p} as text[])".format(p=p) for p in _batch_params))
+_in_keys = "in :keys"        # expanded per dialect from a list of tuples
+
+
+_queries = {
+    "tx_info": """
+        select hgnc, cds_start_i, cds_end_i, tx_ac, alt_ac, alt_aln_method
+        from {s}transcript T
+        join {s}exon_set ES on T.ac=ES.tx_ac
+        where tx_ac=:tx_ac and alt_ac=:alt_ac and alt_aln_method=:alt_aln_method
+        """,
+    "tx_exons": """
+        select *
+        from {s}tx_exon_aln_v
+        where tx_ac=:tx_ac and alt_ac=:alt_ac and alt_aln_method=:alt_aln_method
+        order by alt_start_i
+        """,
+    "tx_for_gene": """
+        select hgnc, cds_start_i, cds_end_i, tx_ac, alt_ac, alt_aln_method
+        from {s}transcript T
+        join {s}exon_set ES on T.ac=ES.tx_ac
+        where alt_aln_method != 'transcript' and hgnc=:gene
+        order by tx_ac, alt_ac, alt_aln_method
+        """,
+    "tx_for_region": """
+        select tx_ac, alt_ac, alt_strand, alt_aln_method, lower(span) as start_i, upper(span) as end_i
+        from {s}exon_set_span_mv
+        where alt_ac=:alt_ac and alt_aln_method=:alt_aln_method and span && int4range(:start_i, :end_i)
+        order by tx_ac
+        """,
+    "tx_spans": """
+        select tx_ac, alt_ac, alt_strand, alt_aln_method, min(start_i) as start_i, max(end_i) as end_i
+        from {s}exon_set ES
+        join {s}exon E on ES.exon_set_id=E.exon_set_id
+        where alt_ac=:alt_ac and alt_aln_method=:alt_aln_method
+        group by tx_ac, alt_ac, alt_strand, alt_aln_method
+        """,
+    "tx_info_batch": """
+        select hgnc, cds_start_i, cds_end_i, tx_ac, alt_ac, alt_aln_method
+        from {s}transcript T
+        join {s}exon_set ES on T.ac=ES.tx_ac
+        where (tx_ac, alt_ac, alt_aln_method) {in_keys}
+        """,
+    "tx_exons_batch": """
+        select *
+        from {s}tx_exon_aln_v
+        where (tx_ac, alt_ac, alt_aln_method) {in_keys}
+        order by tx_ac, alt_ac, alt_aln_method, alt_start_i
+        """,
+    "tx_similar": """
+        select *
+        from {s}tx_similarity_v
+        where tx_ac1=:tx_ac
+        order by tx_ac2
+        """,
+    "schema_version": """
+        select value from {s}meta where key='schema_version'
+        """,
+}
+
+# replacements for databases other than PostgreSQL, which lack range
+# types and the materialized views
+_portable_queries = {
+    "tx_for_region": """
+        select tx_ac, alt_ac, alt_strand, alt_aln_method, min(start_i) as start_i, max(end_i) as end_i
+        from {s}exon_set ES
+        join {s}exon E on ES.exon_set_id=E.exon_set_id
+        where alt_ac=:alt_ac and alt_aln_method=:alt_aln_method
+        group by tx_ac, alt_ac, alt_strand, alt_aln_method
+        having max(end_i) > :start_i and min(start_i) < :end_i
+        order by tx_ac
+        """,
+}
+
+
+class UTADataProvider(object):
+
+    """queries of UTA transcripts and alignments, optionally cached
+
+    session is a SQLAlchemy session, as from uta.connect(); cache is
+    None or a cache as from uta.query_cache.make_cache().
+
+    With region_index, get_tx_for_region() fetches the spans of all
+    transcripts on an (alt_ac, alt_aln_method) once, and answers
+    queries from an in-memory interval index (uta.interval_index).
+
+    The *_batch methods look up many keys with one query per
+    batch_size keys not already cached.
+
+    """
+
+    def __init__(self, session, cache=None, schema=usam.schema_name, region_index=False, batch_size=1000):
+        self.session = session
+        self.cache = cache
+        self.schema = schema
+        self.region_index = region_index
+        self.batch_size = batch_size
+        self.n_queries = 0
+        self._region_indexes = {}
+        prefix = schema + "." if schema else ""
+        self._pg = session.bind.dialect.name == "postgresql"
+        in_keys = _pg_in_keys if self._pg else _in_keys
+        queries = dict(_queries, **({} if self._pg else _portable_queries))
+        self._sql = {}
+        for name, sql in queries.items():
+            self._sql[name] = sa.text(sql.format(s=prefix, in_keys=in_keys))
+            if name.endswith("_batch") and not self._pg:
+                self._sql[name] = self._sql[name].bindparams(sa.bindparam("keys", expanding=True))
+        self._schema_version = None
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({url}; schema={self.schema}, cache={self.cache!r})".format(
+            self=self, url=self.url)
+
+    @property
+    def url(self):
+        """database url, without password"""
+        u = self.session.bind.url
+        return "{u.drivername}://{host}{port}/{db}".format(
+            u=u, host=u.host or "", port=":{}".format(u.port) if u.port else "", db=u.database or "")
+
+    @property
+    def schema_version(self):
+        """schema version recorded in the meta table"""
+        if self._schema_version is None:
+            rows = self._execute("schema_version", {})
+            self._schema_version = rows[0]["value"] if rows else usam.schema_version
+        return self._schema_version
+
+    def get_tx_info(self, tx_ac, alt_ac, alt_aln_method):
+        """return transcript info (hgnc, cds_start_i, cds_end_i, tx_ac,
+        alt_ac, alt_aln_method) for tx_ac aligned to alt_ac by
+        alt_aln_method, or None"""
+        rows = self._query("tx_info", tx_ac=tx_ac, alt_ac=alt_ac, alt_aln_method=alt_aln_method)
+        if len(rows) > 1:
+            raise UTAError("multiple transcript info records for {tx_ac}, {alt_ac}, {alt_aln_method}".format(
+                tx_ac=tx_ac, alt_ac=alt_ac, alt_aln_method=alt_aln_method))
+        return rows[0] if rows else None
+
+    def get_tx_exons(self, tx_ac, alt_ac, alt_aln_method):
+        """return exon alignments (rows of tx_exon_aln_v) for tx_ac on
+        alt_ac by alt_aln_method, in alt_ac order"""
+        return self._query("tx_exons", tx_ac=tx_ac, alt_ac=alt_ac, alt_aln_method=alt_aln_method)
+
+    def get_tx_info_batch(self, keys):
+        """return dict of (tx_ac, alt_ac, alt_aln_method) -> transcript
+        info or None for each key in keys, as for get_tx_info()"""
+        results = self._query_batch("tx_info", "tx_info_batch", keys)
+        for key, rows in results.items():
+            if len(rows) > 1:
+                raise UTAError("multiple transcript info records for {}, {}, {}".format(*key))
+            results[key] = rows[0] if rows else None
+        return results
+
+    def get_tx_exons_batch(self, keys):
+        """return dict of (tx_ac, alt_ac, alt_aln_method) -> exon
+        alignments for each key in keys, as for get_tx_exons()"""
+        return self._query_batch("tx_exons", "tx_exons_batch", keys)
+
+    def get_tx_for_gene(self, gene):
+        """return transcript info for all alignments of transcripts of
+        gene (HGNC symbol)"""
+        return self._query("tx_for_gene", gene=gene)
+
+    def get_tx_for_region(self, alt_ac, alt_aln_method, start_i, end_i):
+        """return transcripts (tx_ac, alt_ac, alt_strand,
+        alt_aln_method, start_i, end_i) aligned to alt_ac by
+        alt_aln_method that overlap the interbase interval
+        [start_i, end_i)
+
+        On PostgreSQL, spans are read from exon_set_span_mv, and so
+        reflect exon sets as of its last refresh (uta
+        refresh-matviews); the region index and other databases read
+        exon_set and exon directly.
+
+        """
+        if self.region_index:
+            rows = self._get_region_index(alt_ac, alt_aln_method).overlapping(start_i, end_i)
+            return [dict(r) for r in sorted(rows, key=lambda r: r["tx_ac"])]
+        return self._query("tx_for_region", alt_ac=alt_ac, alt_aln_method=alt_aln_method,
+                           start_i=start_i, end_i=end_i)
+
+    def get_similar_transcripts(self, tx_ac):
+        """return rows of tx_similarity_v for transcripts similar to tx_ac"""
+        return self._query("tx_similar", tx_ac=tx_ac)
+
+    ############################################################################
+    # Internal methods
+
+    def _cache_key(self, name, params):
+        return ((self.url, self.schema, self.schema_version, name)
+                + tuple(params[k] for k in sorted(params)))
+
+    def _get_region_index(self, alt_ac, alt_aln_method):
+        key = (alt_ac, alt_aln_method)
+        if key not in self._region_indexes:
+            rows = self._query("tx_spans", alt_ac=alt_ac, alt_aln_method=alt_aln_method)
+            self._region_indexes[key] = NCList((r["start_i"], r["end_i"], r) for r in rows)
+        return self._region_indexes[key]
+
+    def _query(self, name, **params):
+        if self.cache is None:
+            return self._execute(name, params)
+        key = self._cache_key(name, params)
+        rows = self.cache.get(key, _missing)
+        if rows is _missing:
+            rows = self._execute(name, params)
+            self.cache.put(key, rows)
+        return _copy_rows(rows)
+
+    def _query_batch(self, name, batch_name, keys):
+        """return dict of key -> rows of query name for each (tx_ac,
+        alt_ac, alt_aln_method) key, querying keys not in cache in
+        batches with query batch_name"""
+        keys = [tuple(k) for k in keys]
+        results = {}
+        misses = []
+        for key in keys:
+            if key in results:
+                continue
+            rows = _missing
+            if self.cache is not None:
+                rows = self.cache.get(self._cache_key(name, _key_params(key)), _missing)
+            if rows is _missing:
+                misses.append(key)
+                results[key] = []
+            else:
+                results[key] = rows
+        for batch in chunks(misses, self.batch_size):
+            if self._pg:
+                params = dict(zip(_batch_params, (list(v) for v in zip(*batch))))
+            else:
+                params = {"keys": batch}
+            for row in self._execute(batch_name, params):
+                results[(row["tx_ac"], row["alt_ac"], row["alt_aln_method"])].append(row)
+            if self.cache is not None:
+                for key in batch:
+                    self.cache.put(self._cache_key(name, _key_params(key)), results[key])
+        if self.cache is not None:
+            results = {key: _copy_rows(rows) for key, rows in results.items()}
+        return results
+
+    def _execute(self, name, params):
+        self.n_queries += 1
+        result = self.session.execute(self._sql[name], params)
+        keys = list(result.keys())
+        return [dict(zip(keys, row)) for row in result]
+
+
+def _copy_rows(rows):
+    # cached rows are shared; callers get their own copies
+    return [dict(r) for r in rows]
+
+
+def _key_params(key):
+    tx_ac, alt_ac, alt_aln_method = key
+    return dict(tx_ac=tx_ac, alt_ac=alt_ac, alt_aln_method=alt_aln_method)
+
+
+def connect(db_url=uta.default_db_url, cache=None, **connect_kw):
+    """return a UTADataProvider for db_url; connect_kw (pool and
+    connection settings) are passed to uta.connect()"""
+    return UTADataProvider(uta.connect(db_url, **connect_kw), cache=cache)
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,76 @@
+"""persistent cache of exon alignments
+
+Many exon pairs in tx_alt_exon_pairs_v align identical sequences (e.g.,
+the same transcript exon on NC, NT, and NW copies of a chromosome, or
+on patch contigs).  ExonAlnCache stores the cigar for each aligned
+pair of sequences, keyed by the md5 digests of the two sequences, so
+that repeated pairs need not be realigned, within or across runs.
+
+The cache is an sqlite3 database file.  It may be opened by several
+processes concurrently (e.g., align-exons workers); writes are
+serialized by sqlite.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sqlite3
+
+
+class ExonAlnCache(object):
+
+    def __init__(self, path, timeout=300):
+        self._path = path
+        self._con = sqlite3.connect(path, timeout=timeout)
+        self._con.execute("pragma journal_mode=wal")
+        self._con.execute("""
+            create table if not exists exon_aln_cache (
+                tx_md5 text not null,
+                alt_md5 text not null,
+                cigar text not null,
+                primary key (tx_md5, alt_md5)
+            )""")
+        self._con.commit()
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self._path!r})".format(self=self)
+
+    def __len__(self):
+        return self._con.execute("select count(*) from exon_aln_cache").fetchone()[0]
+
+    def get(self, tx_md5, alt_md5):
+        """return cigar for (tx_md5, alt_md5), or None if not cached"""
+        row = self._con.execute(
+            "select cigar from exon_aln_cache where tx_md5=? and alt_md5=?",
+            (tx_md5, alt_md5)).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, tx_md5, alt_md5, cigar):
+        """cache cigar for (tx_md5, alt_md5); not durable until commit()"""
+        self._con.execute(
+            "insert or ignore into exon_aln_cache (tx_md5, alt_md5, cigar) values (?,?,?)",
+            (tx_md5, alt_md5, cigar))
+
+    def commit(self):
+        self._con.commit()
+
+    def close(self):
+        self._con.commit()
+        self._con.close()
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,448 @@
+"""binary columnar files for uta.formats records
+
+The ETL intermediates (exonsets, txinfo, seqinfo, geneinfo,
+geneaccessions) are gzipped TSV files, and consumers re-parse text
+such as exons_se_i ("0,120;120,159;...") for every row.  This module
+stores the same records column by column in a single uncompressed
+file that may be memory-mapped:
+
+* strings: int64 offsets (n+1) and a UTF-8 blob
+* integers (e.g., strand, len): int64 values
+* intervals (exons_se_i, cds_se_i): int64 offsets (n+1) into packed
+  int64 arrays of starts and ends
+* string lists (geneinfo aliases, xrefs): as strings, joined as in TSV
+
+Nullable columns have an additional byte mask.  All integers are
+little-endian.  The file layout is:
+
+    MAGIC, column blocks (8-byte aligned), JSON footer,
+    footer length (uint64), MAGIC
+
+ColumnarReader returns the same records as the TSV readers, so either
+file type may be loaded; column() returns the underlying arrays for
+consumers that can use them directly (e.g., exon intervals as
+integers).  Columnar files are written in one pass, but columns are
+buffered in memory until close().
+
+"""
+
+from __future__ import division
+
+import array
+import collections
+import io
+import json
+import mmap
+import struct
+import sys
+
+from uta.formats.exonset import ExonSet, ExonSetReader, ExonSetWriter
+from uta.formats.geneaccessions import GeneAccessions, GeneAccessionsReader, GeneAccessionsWriter
+from uta.formats.geneinfo import GeneInfo, GeneInfoReader, GeneInfoWriter, default_sep
+from uta.formats.seqinfo import SeqInfo, SeqInfoReader, SeqInfoWriter
+from uta.formats.txinfo import TxInfo, TxInfoReader, TxInfoWriter
+
+MAGIC = b"UTACOL1\n"
+_PY2 = sys.version_info[0] == 2
+_LITTLE = sys.byteorder == "little"
+_text_type = type(u"")
+
+_Schema = collections.namedtuple("_Schema", ["record_class", "reader_class", "writer_class", "kinds"])
+
+# record type name -> _Schema; kinds maps fields to column kinds, "str" if not given
+SCHEMAS = collections.OrderedDict([
+    ("ExonSet", _Schema(ExonSet, ExonSetReader, ExonSetWriter,
+                        {"strand": "int", "exons_se_i": "intervals"})),
+    ("TxInfo", _Schema(TxInfo, TxInfoReader, TxInfoWriter,
+                       {"cds_se_i": "intervals", "exons_se_i": "intervals"})),
+    ("SeqInfo", _Schema(SeqInfo, SeqInfoReader, SeqInfoWriter, {"len": "int"})),
+    ("GeneInfo", _Schema(GeneInfo, GeneInfoReader, GeneInfoWriter, {"aliases": "strlist", "xrefs": "strlist"})),
+    ("GeneAccessions", _Schema(GeneAccessions, GeneAccessionsReader, GeneAccessionsWriter, {})),
+])
+
+
+def is_columnar(path):
+    """return True if path is a columnar file"""
+    with io.open(path, "rb") as fh:
+        return fh.read(len(MAGIC)) == MAGIC
+
+
+def parse_intervals(s):
+    """parse "s,e;s,e;..." into a list of (start, end) integer tuples
+
+    >>> parse_intervals("0,120;120,159")
+    [(0, 120), (120, 159)]
+    >>> parse_intervals("")
+    []
+
+    """
+    if not s:
+        return []
+    intervals = []
+    for se in s.split(";"):
+        start, end = se.split(",")
+        intervals.append((int(start), int(end)))
+    return intervals
+
+
+def format_intervals(intervals):
+    """format (start, end) tuples as "s,e;s,e;..."
+
+    >>> print(format_intervals([(0, 120), (120, 159)]))
+    0,120;120,159
+
+    """
+    return str(";".join("{},{}".format(s, e) for s, e in intervals))
+
+
+class ColumnarWriter(object):
+    """write records of record_class to a columnar file at path"""
+
+    def __init__(self, path, record_class):
+        self.path = path
+        self.record_class = record_class
+        self.type_name = _type_name(record_class)
+        kinds = SCHEMAS[self.type_name].kinds
+        self._columns = [_ColumnBuffer(f, kinds.get(f, "str")) for f in record_class._fields]
+        self.n_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+
+    def write(self, rec):
+        for col, v in zip(self._columns, rec):
+            col.append(v)
+        self.n_rows += 1
+
+    def close(self):
+        with io.open(self.path, "wb") as fh:
+            fh.write(MAGIC)
+            footer = {"version": 1, "record_type": self.type_name, "n_rows": self.n_rows,
+                      "columns": [col.write(fh) for col in self._columns]}
+            footer = json.dumps(footer, sort_keys=True).encode("utf-8")
+            fh.write(footer)
+            fh.write(struct.pack("<Q", len(footer)))
+            fh.write(MAGIC)
+
+
+class ColumnarReader(object):
+    """memory-mapped reader of a columnar file
+
+    Iterating yields records as the TSV reader for the type would.
+    column(name) returns a sequence of the column's values as stored:
+    str (or None), int (or None), list of (start, end) tuples, or list
+    of str.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = io.open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+            raise RuntimeError("{path}: not a columnar file".format(path=path))
+        footer_end = len(mm) - len(MAGIC) - 8
+        footer_len, = struct.unpack_from("<Q", mm, footer_end)
+        footer = json.loads(mm[footer_end - footer_len:footer_end].decode("utf-8"))
+        self.type_name = footer["record_type"]
+        self.schema = SCHEMAS[self.type_name]
+        self.record_class = self.schema.record_class
+        self.n_rows = footer["n_rows"]
+        self._columns = collections.OrderedDict(
+            (c["name"], _COLUMN_TYPES[c["kind"]](mm, self.n_rows, c)) for c in footer["columns"])
+        self.n_read = 0
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.path!r}; {self.type_name}, {self.n_rows} rows)".format(self=self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, i):
+        return self.record_class(*[col.tsv_value(i) for col in self._columns.values()])
+
+    def __iter__(self):
+        cols = [self._columns[f] for f in self.record_class._fields]
+        for i in range(self.n_rows):
+            self.n_read = i + 1
+            yield self.record_class(*[col.tsv_value(i) for col in cols])
+
+    @property
+    def fieldnames(self):
+        return list(self._columns)
+
+    def column(self, name):
+        return self._columns[name]
+
+    def progress(self):
+        """return fraction of rows read, as InputSource.progress()"""
+        return self.n_read / self.n_rows if self.n_rows else 1.0
+
+    def close(self):
+        self._columns = {}
+        try:
+            self._mm.close()
+        except BufferError:
+            # views from column() are still referenced; the map is
+            # released when they are
+            pass
+        self._fh.close()
+
+
+def tsv_to_columnar(tsv_fh, path):
+    """convert a uta.formats TSV file (open, with header) to a columnar
+    file; the record type is inferred from the header; returns the
+    number of rows written"""
+    header = next(iter(tsv_fh))
+    fields = set(header.rstrip("\r\n").split("\t"))
+    for schema in SCHEMAS.values():
+        if set(schema.record_class._fields) == fields:
+            break
+    else:
+        raise RuntimeError("Format error: header doesn't match any uta.formats type: " + header.strip())
+    lines = _prepend(header, tsv_fh)
+    with ColumnarWriter(path, schema.record_class) as w:
+        for rec in schema.reader_class(lines):
+            w.write(rec)
+    return w.n_rows
+
+
+def columnar_to_tsv(path, tsv_fh):
+    """write columnar file at path to tsv_fh as TSV; returns the number
+    of rows written"""
+    with ColumnarReader(path) as rdr:
+        writer = rdr.schema.writer_class(tsv_fh)
+        for rec in rdr:
+            writer.write(rec)
+        return rdr.n_rows
+
+
+############################################################################
+# Internals
+
+def _type_name(record_class):
+    for name, schema in SCHEMAS.items():
+        if issubclass(record_class, schema.record_class):
+            return name
+    raise ValueError("{cls} is not a uta.formats record type".format(cls=record_class))
+
+
+def _prepend(line, it):
+    yield line
+    for l in it:
+        yield l
+
+
+def _encode(v):
+    if isinstance(v, bytes):
+        return v
+    if not isinstance(v, _text_type):
+        v = _text_type(v)
+    return v.encode("utf-8")
+
+
+def _decode(b):
+    return b if _PY2 else b.decode("utf-8")
+
+
+def _int64_typecode():
+    # "q" is unavailable on Python 2, where "l" is 8 bytes on LP64 platforms
+    for tc in ("q", "l"):
+        try:
+            if array.array(str(tc)).itemsize == 8:
+                return str(tc)
+        except ValueError:
+            pass
+    raise RuntimeError("no 8-byte integer array type on this platform")
+
+
+_INT64 = _int64_typecode()
+
+
+def _int64_array(values=()):
+    a = array.array(_INT64, values)
+    if not _LITTLE:
+        a.byteswap()
+    return a
+
+
+def _int64_view(mm, offset, length):
+    """return an indexable view of length little-endian int64s at offset"""
+    if _LITTLE and not _PY2:
+        return memoryview(mm)[offset:offset + 8 * length].cast("q")
+    return _Int64View(mm, offset, length)
+
+
+class _Int64View(object):
+    # struct-based view, for Python 2 (no memoryview.cast)
+
+    def __init__(self, buf, offset, length):
+        self._buf, self._offset, self._len = buf, offset, length
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(self._len)
+            vals = struct.unpack_from(str("<{}q".format(max(stop - start, 0))), self._buf, self._offset + 8 * start)
+            return list(vals[::step])
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError(i)
+        return struct.unpack_from(str("<q"), self._buf, self._offset + 8 * i)[0]
+
+
+class _ColumnBuffer(object):
+    """accumulates values of one column during writing"""
+
+    def __init__(self, name, kind):
+        self.name, self.kind = name, kind
+        self.nulls = bytearray()
+        self.offsets = _int64_array([0])
+        self.data = bytearray()
+        self.values = _int64_array()
+        self.ends = _int64_array()
+
+    def append(self, v):
+        is_null = v is None or (v == "" and self.kind == "int")
+        self.nulls.append(1 if is_null else 0)
+        if self.kind == "str":
+            if not is_null:
+                self.data.extend(_encode(v))
+            self.offsets.append(len(self.data))
+        elif self.kind == "strlist":
+            if not is_null:
+                self.data.extend(_encode(default_sep.join(v)))
+            self.offsets.append(len(self.data))
+        elif self.kind == "int":
+            self.values.append(0 if is_null else int(v))
+        elif self.kind == "intervals":
+            intervals = [] if is_null else parse_intervals(v)
+            if not is_null and format_intervals(intervals) != v:
+                raise ValueError("{name}: {v!r} can't be stored exactly as intervals".format(name=self.name, v=v))
+            for s, e in intervals:
+                self.values.append(s)
+                self.ends.append(e)
+            self.offsets.append(len(self.values))
+
+    def write(self, fh):
+        blocks = {}
+
+        def _block(name, b):
+            pos = fh.tell()
+            data = bytes(b) if isinstance(b, bytearray) else b.tostring() if _PY2 else b.tobytes()
+            fh.write(data)
+            fh.write(b"\0" * (-fh.tell() % 8))
+            blocks[name] = [pos, len(data)]
+
+        if any(self.nulls):
+            _block("nulls", self.nulls)
+        if self.kind in ("str", "strlist"):
+            _block("offsets", self.offsets)
+            _block("data", self.data)
+        elif self.kind == "int":
+            _block("values", self.values)
+        elif self.kind == "intervals":
+            _block("offsets", self.offsets)
+            _block("starts", self.values)
+            _block("ends", self.ends)
+        return {"name": self.name, "kind": self.kind, "blocks": blocks}
+
+
+class _Column(object):
+    def __init__(self, mm, n_rows, desc):
+        self.name, self.kind, self.n_rows = desc["name"], desc["kind"], n_rows
+        blocks = desc["blocks"]
+        self._nulls = mm[blocks["nulls"][0]:blocks["nulls"][0] + n_rows] if "nulls" in blocks else None
+        self._init(mm, blocks)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, i):
+        if self._nulls is not None and bytearray(self._nulls[i:i + 1])[0]:
+            return None
+        return self._get(i)
+
+    def __iter__(self):
+        return (self[i] for i in range(self.n_rows))
+
+    def tsv_value(self, i):
+        """value as in records from the TSV reader"""
+        return self[i]
+
+
+class _StrColumn(_Column):
+    def _init(self, mm, blocks):
+        self._mm = mm
+        self.offsets = _int64_view(mm, blocks["offsets"][0], self.n_rows + 1)
+        self._data = blocks["data"][0]
+
+    def _get(self, i):
+        return _decode(self._mm[self._data + self.offsets[i]:self._data + self.offsets[i + 1]])
+
+
+class _StrListColumn(_StrColumn):
+    def _get(self, i):
+        return _StrColumn._get(self, i).split(default_sep)
+
+
+class _IntColumn(_Column):
+    def _init(self, mm, blocks):
+        self.values = _int64_view(mm, blocks["values"][0], self.n_rows)
+
+    def _get(self, i):
+        return self.values[i]
+
+    def tsv_value(self, i):
+        v = self[i]
+        return "" if v is None else str(v)
+
+
+class _IntervalsColumn(_Column):
+    def _init(self, mm, blocks):
+        self.offsets = _int64_view(mm, blocks["offsets"][0], self.n_rows + 1)
+        n = self.offsets[self.n_rows]
+        self.starts = _int64_view(mm, blocks["starts"][0], n)
+        self.ends = _int64_view(mm, blocks["ends"][0], n)
+
+    def _get(self, i):
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.starts[a:b], self.ends[a:b]))
+
+    def tsv_value(self, i):
+        v = self[i]
+        return None if v is None else format_intervals(v)
+
+
+_COLUMN_TYPES = {"str": _StrColumn, "strlist": _StrListColumn, "int": _IntColumn, "intervals": _IntervalsColumn}
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -1,34 +1,17 @@
-import csv
-import recordtype
+from uta.formats.tsv import TSVReader, TSVWriter, record_type
 
 
-class ExonSet(recordtype.recordtype('ExonSet',
-                                    ['tx_ac', 'alt_ac', 'method', 'strand', 'exons_se_i'])):
-    pass
+class ExonSet(record_type('ExonSet',
+                          ['tx_ac', 'alt_ac', 'method', 'strand', 'exons_se_i'])):
+    __slots__ = ()
 
 
-class ExonSetWriter(csv.DictWriter):
+class ExonSetWriter(TSVWriter):
+    record_class = ExonSet
 
-    def __init__(self, tsvfile):
-        csv.DictWriter.__init__(
-            self, tsvfile, fieldnames=ExonSet._fields, delimiter=b'\t', lineterminator="\n")
-        csv.DictWriter.writeheader(self)
 
-    def write(self, si):
-        self.writerow(si._asdict())
-
-
-class ExonSetReader(csv.DictReader):
-
-    def __init__(self, tsvfile):
-        csv.DictReader.__init__(self, tsvfile, delimiter=b'\t')
-        if set(self.fieldnames) != set(ExonSet._fields):
-            raise RuntimeError('Format error: expected header with these columns: ' +
-                               ','.join(ExonSet._fields) + " but got: " + ','.join(self.fieldnames))
-
-    def next(self):
-        d = csv.DictReader.next(self)
-        return ExonSet(**d)
+class ExonSetReader(TSVReader):
+    record_class = ExonSet
 
 
 if __name__ == '__main__':
@@ -1,34 +1,17 @@
-import csv
-import recordtype
+from uta.formats.tsv import TSVReader, TSVWriter, record_type
 
 
-class GeneAccessions(recordtype.recordtype('GeneAccessions',
-                                           ['hgnc', 'tx_ac', 'gene_id', 'pro_ac', 'origin'])):
-    pass
+class GeneAccessions(record_type('GeneAccessions',
+                                 ['hgnc', 'tx_ac', 'gene_id', 'pro_ac', 'origin'])):
+    __slots__ = ()
 
 
-class GeneAccessionsWriter(csv.DictWriter):
+class GeneAccessionsWriter(TSVWriter):
+    record_class = GeneAccessions
 
-    def __init__(self, tsvfile):
-        csv.DictWriter.__init__(
-            self, tsvfile, fieldnames=GeneAccessions._fields, delimiter=b'\t', lineterminator="\n")
-        csv.DictWriter.writeheader(self)
 
-    def write(self, si):
-        self.writerow(si._asdict())
-
-
-class GeneAccessionsReader(csv.DictReader):
-
-    def __init__(self, tsvfile):
-        csv.DictReader.__init__(self, tsvfile, delimiter=b'\t')
-        if set(self.fieldnames) != set(GeneAccessions._fields):
-            raise RuntimeError('Format error: expected header with these columns: ' + ','.join(
-                GeneAccessions._fields) + " but got: " + ','.join(self.fieldnames))
-
-    def next(self):
-        d = csv.DictReader.next(self)
-        return GeneAccessions(**d)
+class GeneAccessionsReader(TSVReader):
+    record_class = GeneAccessions
 
 
 if __name__ == '__main__':
@@ -1,41 +1,33 @@
-import csv
-import recordtype
+from uta.formats.tsv import TSVReader, TSVWriter, record_type
 
 default_sep = ','
 
 
-class GeneInfo(recordtype.recordtype('GeneInfo',
-                                     ['gene_id', 'tax_id', 'hgnc', 'maploc', 'aliases', 'type', 'summary', 'descr', 'xrefs'])):
-    pass
+class GeneInfo(record_type('GeneInfo',
+                           ['gene_id', 'tax_id', 'hgnc', 'maploc', 'aliases', 'type', 'summary', 'descr', 'xrefs'])):
+    __slots__ = ()
 
 
-class GeneInfoWriter(csv.DictWriter):
-
-    def __init__(self, tsvfile):
-        csv.DictWriter.__init__(
-            self, tsvfile, fieldnames=GeneInfo._fields, delimiter=b'\t', lineterminator="\n")
-        csv.DictWriter.writeheader(self)
+class GeneInfoWriter(TSVWriter):
+    record_class = GeneInfo
 
     def write(self, si):
         d = si._asdict()
         d['aliases'] = default_sep.join(d['aliases'])
         d['xrefs'] = default_sep.join(d['xrefs'])
-        self.writerow(d)
-
+        self.writerow(d.values())
 
-class GeneInfoReader(csv.DictReader):
 
-    def __init__(self, tsvfile):
-        csv.DictReader.__init__(self, tsvfile, delimiter=b'\t')
-        if set(self.fieldnames) != set(GeneInfo._fields):
-            raise RuntimeError('Format error: expected header with these columns: ' +
-                               ','.join(GeneInfo._fields) + " but got: " + ','.join(self.fieldnames))
+class GeneInfoReader(TSVReader):
+    record_class = GeneInfo
 
     def next(self):
-        d = csv.DictReader.next(self)
-        d['aliases'] = d['aliases'].split(default_sep)
-        d['xrefs'] = d['xrefs'].split(default_sep)
-        return GeneInfo(**d)
+        gi = TSVReader.next(self)
+        gi.aliases = gi.aliases.split(default_sep)
+        gi.xrefs = gi.xrefs.split(default_sep)
+        return gi
+
+    __next__ = next
 
 
 if __name__ == '__main__':
@@ -1,37 +1,25 @@
-import csv
-import recordtype
+from uta.formats.tsv import TSVReader, TSVWriter, record_type
 
 
-class SeqInfo(recordtype.recordtype('SeqInfo', ['md5', 'origin', 'ac', 'descr', 'len', 'seq'])):
-    pass
+class SeqInfo(record_type('SeqInfo', ['md5', 'origin', 'ac', 'descr', 'len', 'seq'])):
+    __slots__ = ()
 
 
-class SeqInfoWriter(csv.DictWriter):
+class SeqInfoWriter(TSVWriter):
+    record_class = SeqInfo
 
-    def __init__(self, tsvfile):
-        csv.DictWriter.__init__(
-            self, tsvfile, fieldnames=SeqInfo._fields, delimiter=b'\t', lineterminator="\n")
-        csv.DictWriter.writeheader(self)
 
-    def write(self, si):
-        self.writerow(si._asdict())
-
-
-class SeqInfoReader(csv.DictReader):
-
-    def __init__(self, tsvfile):
-        csv.DictReader.__init__(self, tsvfile, delimiter=b'\t')
-        if set(self.fieldnames) != set(SeqInfo._fields):
-            raise RuntimeError('Format error: expected header with these columns: ' +
-                               ','.join(SeqInfo._fields) + " but got: " + ','.join(self.fieldnames))
+class SeqInfoReader(TSVReader):
+    record_class = SeqInfo
 
     def next(self):
-        d = csv.DictReader.next(self)
-        si = SeqInfo(**d)
+        si = TSVReader.next(self)
         if si.seq == '':
             si.seq = None
         return si
 
+    __next__ = next
+
 
 if __name__ == '__main__':
 
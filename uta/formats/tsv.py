@@ -0,0 +1,172 @@
+"""tuple-based TSV reading and writing for uta.formats
+
+The formats in this package are tab-separated files with a header
+line.  Readers here map header columns to record fields once, then
+build records directly from split lines; csv is used only for lines
+that contain quotes, so quoted fields written by csv (or by earlier
+versions of these writers) are read correctly.  Writers likewise
+quote only fields that require it, as csv.QUOTE_MINIMAL does.
+
+Records are lightweight mutable classes with __slots__, made by
+record_type(), and provide the subset of the recordtype interface used
+in uta: construction by position or keyword, attribute access and
+assignment, _fields, _asdict(), and _replace().
+
+"""
+
+import collections
+import csv
+import itertools
+
+def record_type(typename, field_names):
+    """return a new record class with the given fields
+
+    >>> Pair = record_type("Pair", ["a", "b"])
+    >>> p = Pair(1, b=2)
+    >>> p.b = 3
+    >>> p
+    Pair(a=1, b=3)
+    >>> tuple(p), p._asdict()["b"]
+    ((1, 3), 3)
+
+    """
+    field_names = tuple(field_names)
+    # as with collections.namedtuple, __init__ is generated so that
+    # construction is a plain function call
+    init_src = "def __init__(self, {args}):\n    {assigns}\n".format(
+        args=", ".join(field_names),
+        assigns="\n    ".join("self.{f} = {f}".format(f=f) for f in field_names) or "pass")
+    namespace = {}
+    exec(init_src, namespace)
+    return type(str(typename), (_Record,), {
+        "__slots__": field_names, "_fields": field_names, "__init__": namespace["__init__"]})
+
+
+class _Record(object):
+    __slots__ = ()
+    _fields = ()
+
+    def __repr__(self):
+        return "{cls}({vals})".format(
+            cls=type(self).__name__,
+            vals=", ".join("{f}={v!r}".format(f=f, v=getattr(self, f)) for f in self._fields))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __iter__(self):
+        return (getattr(self, f) for f in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __getstate__(self):
+        return tuple(self)
+
+    def __setstate__(self, state):
+        for f, v in zip(self._fields, state):
+            setattr(self, f, v)
+
+    def _asdict(self):
+        return collections.OrderedDict(zip(self._fields, self))
+
+    def _replace(self, **kwargs):
+        d = self._asdict()
+        d.update(kwargs)
+        return type(self)(**d)
+
+
+class TSVReader(object):
+    """iterator of record_class instances from a TSV file with a
+    header; columns may appear in any order"""
+
+    record_class = None
+
+    def __init__(self, tsvfile, delimiter="\t"):
+        self._lines = iter(tsvfile)
+        self._delimiter = str(delimiter)
+        try:
+            header = next(self._lines)
+        except StopIteration:
+            header = ""
+        self.fieldnames = self._split(header) if header.strip() else []
+        fields = self.record_class._fields
+        if set(self.fieldnames) != set(fields):
+            raise RuntimeError("Format error: expected header with these columns: " +
+                               ",".join(fields) + " but got: " + ",".join(self.fieldnames))
+        self._n_cols = len(self.fieldnames)
+        idx = [self.fieldnames.index(f) for f in fields]
+        # in the common case that columns are in field order, skip reordering
+        self._idx = None if idx == list(range(len(fields))) else idx
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        while not line.strip():
+            line = next(self._lines)
+        values = self._split(line)
+        if len(values) != self._n_cols:
+            if len(values) > self._n_cols:
+                raise ValueError("expected {n} columns but got {m}: {line!r}".format(
+                    n=self._n_cols, m=len(values), line=line))
+            values += [None] * (self._n_cols - len(values))  # as csv.DictReader restval
+        if self._idx is not None:
+            values = [values[i] for i in self._idx]
+        return self.record_class(*values)
+
+    next = __next__
+
+    def _split(self, line):
+        if '"' in line:
+            # csv reads continuation lines of quoted fields from _lines
+            return next(csv.reader(itertools.chain([line], self._lines), delimiter=self._delimiter))
+        return line.rstrip("\r\n").split(self._delimiter)
+
+
+class TSVWriter(object):
+    """write records of record_class to a TSV file with a header"""
+
+    record_class = None
+
+    def __init__(self, tsvfile, delimiter="\t"):
+        self._fh = tsvfile
+        self._delimiter = str(delimiter)
+        self._csv_writer = csv.writer(tsvfile, delimiter=self._delimiter, lineterminator="\n")
+        self.writerow(self.record_class._fields)
+
+    def write(self, rec):
+        self.writerow(rec)
+
+    def writerow(self, values):
+        # str() gives bytes for (ASCII) unicode values on Python 2, as csv does
+        values = ["" if v is None else v if isinstance(v, str) else str(v) for v in values]
+        line = self._delimiter.join(values)
+        if ('"' in line or "\n" in line or "\r" in line
+                or line.count(self._delimiter) != len(values) - 1):
+            self._csv_writer.writerow(values)    # quote as needed
+        else:
+            self._fh.write(line + "\n")
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -1,34 +1,17 @@
-import csv
-import recordtype
+from uta.formats.tsv import TSVReader, TSVWriter, record_type
 
 
-class TxInfo(recordtype.recordtype('TxInfo',
-                                   ['origin', 'ac', 'hgnc', 'cds_se_i', 'exons_se_i'])):
-    pass
+class TxInfo(record_type('TxInfo',
+                         ['origin', 'ac', 'hgnc', 'cds_se_i', 'exons_se_i'])):
+    __slots__ = ()
 
 
-class TxInfoWriter(csv.DictWriter):
+class TxInfoWriter(TSVWriter):
+    record_class = TxInfo
 
-    def __init__(self, tsvfile):
-        csv.DictWriter.__init__(
-            self, tsvfile, fieldnames=TxInfo._fields, delimiter=b'\t', lineterminator="\n")
-        csv.DictWriter.writeheader(self)
 
-    def write(self, si):
-        self.writerow(si._asdict())
-
-
-class TxInfoReader(csv.DictReader):
-
-    def __init__(self, tsvfile):
-        csv.DictReader.__init__(self, tsvfile, delimiter=b'\t')
-        if set(self.fieldnames) != set(TxInfo._fields):
-            raise RuntimeError('Format error: expected header with these columns: '
-                               + ', '.join(TxInfo._fields) + " but got: " + ', '.join(self.fieldnames))
-
-    def next(self):
-        d = csv.DictReader.next(self)
-        return TxInfo(**d)
+class TxInfoReader(TSVReader):
+    record_class = TxInfo
 
 
 if __name__ == '__main__':
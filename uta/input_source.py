@@ -0,0 +1,182 @@
+"""single-pass line source for loader input files
+
+Loaders previously read each gzipped input file twice: once to count
+lines for progress messages, and again to parse it.  InputSource
+streams the file once and estimates progress instead:
+
+* from a sidecar line count (<path>.nlines), written after a complete
+  read and valid while the file's size and mtime are unchanged;
+* otherwise from the position in the (compressed) file.
+
+Plain, gzip, and bgzip files are accepted; the format is detected from
+the file contents.  With threads > 1, compressed files are
+decompressed by an external bgzip or pigz process when one is on the
+PATH.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import gzip
+import io
+import logging
+import os
+import subprocess
+
+try:
+    from shutil import which
+except ImportError:                                 # py2
+    from distutils.spawn import find_executable as which
+
+logger = logging.getLogger(__name__)
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class InputSource(object):
+    """iterable of lines (bytes) from path
+
+    >>> src = InputSource(path)                       # doctest: +SKIP
+    >>> for i, row in enumerate(SomeReader(src)):     # doctest: +SKIP
+    ...     print(i, src.progress())
+
+    """
+
+    def __init__(self, path, threads=1):
+        self.path = path
+        self.threads = threads
+        self.n_lines = 0
+        self.size = os.path.getsize(path)
+        self.format = _detect_format(path)
+        self.n_lines_expected = self._read_sidecar()
+        self._raw = None
+        self._cmd = None
+        self._proc = None
+        self._fh = None
+        self._open()
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.path!r}; {self.format}, {self.n_lines} lines read)".format(self=self)
+
+    def __iter__(self):
+        for line in self._fh:
+            self.n_lines += 1
+            yield line
+        self._finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def progress(self):
+        """return estimated fraction of the file read, in [0, 1]"""
+        if self.n_lines_expected:
+            return min(self.n_lines / self.n_lines_expected, 1.0)
+        if not self.size or self._raw is None or self._raw.closed:
+            return 1.0
+        return min(os.lseek(self._raw.fileno(), 0, os.SEEK_CUR) / self.size, 1.0)
+
+    def close(self):
+        if self._fh is not None and self._fh is not self._raw:
+            self._fh.close()
+        if self._proc is not None:
+            self._proc.wait()
+        if self._raw is not None:
+            self._raw.close()
+
+    @property
+    def sidecar_path(self):
+        return self.path + ".nlines"
+
+    ############################################################################
+    # Internal methods
+
+    def _open(self):
+        # the decompressor (gzip module or external process) reads from
+        # self._raw, so the offset of its file descriptor tracks progress
+        # through the compressed file
+        self._raw = io.open(self.path, "rb")
+        if self.format == "plain":
+            self._fh = self._raw
+            return
+        self._cmd = _decompress_cmd(self.format, self.threads) if self.threads > 1 else None
+        if self._cmd is not None:
+            logger.info("decompressing {self.path} with {cmd}".format(self=self, cmd=" ".join(self._cmd)))
+            self._proc = subprocess.Popen(self._cmd, stdin=self._raw, stdout=subprocess.PIPE)
+            self._fh = self._proc.stdout
+        else:
+            self._fh = gzip.GzipFile(fileobj=self._raw, mode="rb")
+
+    def _finish(self):
+        if self._proc is not None:
+            self._proc.stdout.close()
+            if self._proc.wait() != 0:
+                raise IOError("{cmd}: exited with status {rc} while reading {path}".format(
+                    cmd=self._cmd[0],
+                    rc=self._proc.returncode, path=self.path))
+        if self.n_lines_expected != self.n_lines:
+            self._write_sidecar()
+
+    def _stat_key(self):
+        st = os.stat(self.path)
+        return "{size} {mtime:.6f}".format(size=st.st_size, mtime=st.st_mtime)
+
+    def _read_sidecar(self):
+        try:
+            with io.open(self.sidecar_path, "r") as fh:
+                stat_key, n_lines = fh.read().strip().rsplit(" ", 1)
+        except (IOError, OSError, ValueError):
+            return None
+        if stat_key != self._stat_key():
+            return None
+        return int(n_lines)
+
+    def _write_sidecar(self):
+        try:
+            with io.open(self.sidecar_path, "w") as fh:
+                fh.write("{stat_key} {n}\n".format(stat_key=self._stat_key(), n=self.n_lines))
+        except (IOError, OSError) as e:
+            logger.debug("{path}: couldn't write line count ({e})".format(path=self.sidecar_path, e=e))
+
+
+def _detect_format(path):
+    """return "bgzip", "gzip", or "plain" based on file contents"""
+    with io.open(path, "rb") as fh:
+        head = fh.read(18)
+    if head[:2] != _GZIP_MAGIC:
+        return "plain"
+    # BGZF: gzip with FEXTRA flag and a "BC" extra subfield
+    if len(head) >= 14 and bytearray(head)[3] & 4 and head[12:14] == b"BC":
+        return "bgzip"
+    return "gzip"
+
+
+def _decompress_cmd(format, threads):
+    """return an external decompression command for format using
+    threads, or None if no suitable program is available"""
+    bgzip = which("bgzip")
+    pigz = which("pigz")
+    if format == "bgzip" and bgzip:
+        return [bgzip, "-d", "-c", "-@", str(threads)]
+    if pigz:
+        return [pigz, "-d", "-c", "-p", str(threads)]
+    return None
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,92 @@
+"""in-memory index of intervals for overlap queries
+
+NCList is a nested containment list (Alekseyenko and Lee,
+Bioinformatics 23:1386, 2007).  Intervals are sorted by start, and
+each interval that is contained in another is moved to a sublist of
+its container.  Within any list, then, both starts and ends increase,
+so the first interval that overlaps a query is found by bisection, and
+overlapping intervals follow it contiguously.  A query costs
+O(log n + k) for k results (times the nesting depth, which is small
+for transcript alignments).
+
+Intervals are interbase, [start, end), as elsewhere in uta; an
+interval overlaps a query [start, end) if it shares at least one
+position with it.
+
+>>> ncl = NCList([(100, 200, 1), (150, 160, 2), (300, 400, 3)])
+>>> ncl.overlapping(155, 301)
+[1, 2, 3]
+>>> ncl.overlapping(200, 300)
+[]
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import bisect
+
+
+class NCList(object):
+
+    def __init__(self, intervals):
+        """intervals is an iterable of (start, end, value)"""
+        # each list is (starts, ends, values, children), with children[i]
+        # the index of the sublist for interval i, or None
+        self._lists = [([], [], [], [])]
+        self._n = 0
+        stack = []      # (start, end, list index, position) of open containers
+        for start, end, value in sorted(intervals, key=lambda iv: (iv[0], -iv[1])):
+            while stack and not (start >= stack[-1][0] and end <= stack[-1][1]):
+                stack.pop()
+            if stack:
+                _, _, li, pos = stack[-1]
+                child = self._lists[li][3][pos]
+                if child is None:
+                    child = self._lists[li][3][pos] = len(self._lists)
+                    self._lists.append(([], [], [], []))
+                li = child
+            else:
+                li = 0
+            starts, ends, values, children = self._lists[li]
+            starts.append(start)
+            ends.append(end)
+            values.append(value)
+            children.append(None)
+            stack.append((start, end, li, len(starts) - 1))
+            self._n += 1
+
+    def __len__(self):
+        return self._n
+
+    def overlapping(self, start, end):
+        """return values of intervals that overlap [start, end), in
+        order of interval start"""
+        results = []
+        self._overlapping(0, start, end, results)
+        return results
+
+    def _overlapping(self, li, start, end, results):
+        starts, ends, values, children = self._lists[li]
+        i = bisect.bisect_right(ends, start)
+        while i < len(starts) and starts[i] < end:
+            results.append(values[i])
+            if children[i] is not None:
+                self._overlapping(children[i], start, end, results)
+            i += 1
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
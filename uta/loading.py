@@ -1,11 +1,15 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import collections
 import csv
 import datetime
 import gzip
 import hashlib
 import itertools
 import logging
+import multiprocessing
+import signal
+import tempfile
 import time
 
 from biocommons.seqrepo import SeqRepo
@@ -18,9 +22,15 @@ import psycopg2.extras
 import six
 import uta_align.align.algorithms as utaaa
 
+from uta.exceptions import UTAError
+from uta.exon_aln_cache import ExonAlnCache
+from uta.input_source import InputSource
 from uta.lru_cache import lru_cache
+from uta.seq_window_cache import SeqWindowCache
+from uta.tools.parallel import chunks, group_chunks, imap_bounded
 
 import uta
+import uta.formats.columnar as ufcol
 import uta.formats.exonset as ufes
 import uta.formats.geneinfo as ufgi
 import uta.formats.seqinfo as ufsi
@@ -37,121 +47,193 @@ def align_exons(session, opts, cf):
     # imports below are loading depenencies only and are not in setup.py.
 
     update_period = 1000
+    batch_size = 250
+    fetch_size = 10000
+    n_workers = int(opts.get("--workers") or 1)
 
     def _get_cursor(con):
         cur = con.cursor(cursor_factory=psycopg2.extras.NamedTupleCursor)
-        cur.execute("set role {admin_role};".format(
-            admin_role=cf.get("uta", "admin_role")))
-        cur.execute("set search_path = " + usam.schema_name)
         return cur
 
-    def align(s1, s2):
-        score, cigar = utaaa.needleman_wunsch_gotoh_align(str(s1),
-                                                          str(s2),
-                                                          extended_cigar=True)
-        tx_aseq, alt_aseq = utaaa.cigar_alignment(
-            tx_seq, alt_seq, cigar, hide_match=False)
-        return tx_aseq, alt_aseq, cigar.to_string()
+    # --shard K/N selects a disjoint subset of transcripts so that
+    # several loaders may align concurrently against one database.
+    # Each shard keeps its own checkpoint in the meta table: the tx_ac
+    # of the last commit.  Pairs are processed in tx_ac order, so a
+    # restarted run may resume at that tx_ac; any pairs for it that
+    # were already committed are excluded by exon_aln_id is NULL.
+    aln_where_sql = "exon_aln_id is NULL"
+    aln_args = {}
+    ckpt_key = "align-exons checkpoint"
+    if opts.get("--shard"):
+        try:
+            shard_k, shard_n = [int(v) for v in opts["--shard"].split("/")]
+        except ValueError:
+            raise UTAError("--shard must be of the form K/N")
+        if not 1 <= shard_k <= shard_n:
+            raise UTAError("--shard K/N requires 1 <= K <= N")
+        aln_where_sql += " AND mod(('x' || substr(md5(tx_ac), 1, 8))::bit(32)::bigint, %(shard_n)s) = %(shard_k)s - 1"
+        aln_args.update(shard_k=shard_k, shard_n=shard_n)
+        ckpt_key += " {k}/{n}".format(k=shard_k, n=shard_n)
+        logger.info("aligning shard {k}/{n}".format(k=shard_k, n=shard_n))
+
+    aln_cnt_sql = """
+    SELECT count(*) FROM tx_alt_exon_pairs_v TAEP
+    WHERE {where}
+    """
 
     aln_sel_sql = """
     SELECT * FROM tx_alt_exon_pairs_v TAEP
-    WHERE exon_aln_id is NULL
+    WHERE {where}
     ORDER BY tx_ac, alt_ac
     """
 
     aln_ins_sql = """
     INSERT INTO exon_aln (tx_exon_id,alt_exon_id,cigar,added)
-    VALUES (%s,%s,%s,%s)
+    VALUES %s
     """
 
     con = session.bind.pool.connect()
     cur = _get_cursor(con)
-    cur.execute(aln_sel_sql)
-    n_rows = cur.rowcount
-
-    if n_rows == 0:
-        return
-
-    logger.info("{} exon pairs to align".format(n_rows))
-
-    sf = _get_seqfetcher(cf)
-
-    def _fetch_seq(ac, s, e):
-        logger.debug("fetching sequence {ac}[{s}:{e}]".format(ac=ac,s=s,e=e))
-        seq = sf.fetch(ac,s,e)
-        assert seq is not None, "sequence {ac}[{s}:{e}] should never be None (coordinates bogus?)".format(ac=ac,s=s,e=e)
-        if isinstance(seq, six.binary_type):
-            seq = seq.decode("ascii")  # force into unicode
-        assert isinstance(seq, six.text_type)
-        return seq
-
-    rows = cur.fetchall()
-    ac_warning = set()
-    tx_acs = set()
-    aln_rate_s = None
-    decay_rate = 0.25
-    n0, t0 = 0, time.time()
-
-    for i_r, r in enumerate(rows):
-        if i_r > 0 and (i_r % update_period == 0 or (i_r + 1) == n_rows):
+    pool = None
+    sel_cur = None
+    try:
+        ckpt_tx_ac = _get_meta_value(cur, ckpt_key)
+        if ckpt_tx_ac is not None:
+            aln_where_sql += " AND tx_ac >= %(ckpt_tx_ac)s"
+            aln_args.update(ckpt_tx_ac=ckpt_tx_ac)
+            logger.info("resuming from checkpoint at {ac}".format(ac=ckpt_tx_ac))
+
+        cur.execute(aln_cnt_sql.format(where=aln_where_sql), aln_args)
+        n_rows = cur.fetchone()[0]
+
+        if n_rows == 0:
+            _set_meta_value(cur, ckpt_key, None)
+            con.commit()
+            return
+
+        logger.info("{} exon pairs to align".format(n_rows))
+
+        # Exon pairs are streamed from a server-side cursor, fetch_size rows
+        # per round trip. withhold=True keeps the cursor open across the
+        # periodic commits below.
+        sel_cur = con.cursor("align_exons", cursor_factory=psycopg2.extras.NamedTupleCursor,
+                             withhold=True)
+        sel_cur.itersize = fetch_size
+        sel_cur.execute(aln_sel_sql.format(where=aln_where_sql), aln_args)
+
+        # Batches hold whole exon sets, so that each genomic window is
+        # prefetched once (see _prefetch_exon_pairs).
+        pairs = (_ExonPair(*[getattr(r, f) for f in _ExonPair._fields])
+                 for r in sel_cur)
+        batches = group_chunks(pairs, batch_size, key=lambda p: (p.tx_ac, p.alt_ac))
+
+        # Alignments are computed in order in this process (n_workers == 1) or
+        # in a pool of worker processes, each with its own sequence fetcher.
+        # Either way, results are consumed here in input order so that
+        # commits and warnings are identical to the serial case.
+        if n_workers > 1:
+            logger.info("aligning with {n} worker processes".format(n=n_workers))
+            pool = multiprocessing.Pool(n_workers,
+                                        initializer=_align_exon_pairs_worker_init,
+                                        initargs=(cf,))
+            results = itertools.chain.from_iterable(
+                imap_bounded(pool, _align_exon_pairs, batches, max_pending=4 * n_workers))
+        else:
+            pool = None
+            _align_exon_pairs_init(cf)
+            results = itertools.chain.from_iterable(
+                six.moves.map(_align_exon_pairs, batches))
+
+        ac_warning = set()
+        tx_acs = set()
+        n_source = collections.Counter()
+        ins_rows = []
+        aln_rate_s = None
+        decay_rate = 0.25
+        n0, t0 = 0, time.time()
+
+        def _commit(tx_ac):
+            _insert_exon_alns(cur, aln_ins_sql, ins_rows)
+            _set_meta_value(cur, ckpt_key, tx_ac)
             con.commit()
 
-        if r.tx_ac in ac_warning or r.alt_ac in ac_warning:
-            continue
-
-        try:
-            tx_seq = _fetch_seq(r.tx_ac, r.tx_start_i, r.tx_end_i)
-        except KeyError:
-            logger.warning(
-                "{r.tx_ac}: Not in sequence sources; can't align".format(r=r))
-            ac_warning.add(r.tx_ac)
-            continue
-
+        r = None
         try:
-            alt_seq = _fetch_seq(r.alt_ac, r.alt_start_i, r.alt_end_i)
-        except KeyError:
-            logger.warning(
-                "{r.alt_ac}: Not in sequence sources; can't align".format(r=r))
-            ac_warning.add(r.tx_ac)
-            continue
-
-        if r.alt_strand == MINUS_STRAND:
-            alt_seq = reverse_complement(alt_seq)
-        tx_seq = tx_seq.upper()
-        alt_seq = alt_seq.upper()
-
-        tx_aseq, alt_aseq, cigar_str = align(tx_seq, alt_seq)
+            for i_r, (r, cigar_str, missing_ac, source) in enumerate(results):
+                if i_r > 0 and (i_r % update_period == 0 or (i_r + 1) == n_rows):
+                    _commit(r.tx_ac)
+
+                if r.tx_ac in ac_warning or r.alt_ac in ac_warning:
+                    continue
+
+                if missing_ac is not None:
+                    logger.warning(
+                        "{ac}: Not in sequence sources; can't align".format(ac=missing_ac))
+                    ac_warning.add(r.tx_ac)
+                    continue
+
+                added = datetime.datetime.now()
+                ins_rows.append((r.tx_exon_id, r.alt_exon_id, cigar_str, added))
+                tx_acs.add(r.tx_ac)
+                n_source[source] += 1
+
+                if i_r > 0 and (i_r % update_period == 0 or (i_r + 1) == n_rows):
+                    _commit(r.tx_ac)
+                    n1, t1 = i_r, time.time()
+                    nd, td = n1 - n0, t1 - t0
+                    aln_rate = nd / td      # aln rate on this update period
+                    if aln_rate_s is None:  # aln_rate_s is EWMA smoothed average
+                        aln_rate_s = aln_rate
+                    else:
+                        aln_rate_s = decay_rate * aln_rate + (1.0 - decay_rate) * aln_rate_s
+                    etr = (n_rows - i_r - 1) / aln_rate_s        # etr in secs
+                    etr_s = str(datetime.timedelta(seconds=round(etr)))  # etr as H:M:S
+                    logger.info("{i_r}/{n_rows} {p_r:.1f}%; committed; speed={speed:.1f}/{speed_s:.1f} aln/sec (inst/emwa); etr={etr:.0f}s ({etr_s}); {n_tx} tx; "
+                                "{n_ungapped}/{n_aligned} ungapped/aligned; cache {n_hit}/{n_miss} hit/miss".format(
+                        i_r=i_r, n_rows=n_rows, p_r=i_r / n_rows * 100, speed=aln_rate, speed_s=aln_rate_s, etr=etr,
+                        etr_s=etr_s, n_tx=len(tx_acs), n_ungapped=n_source["ungapped"],
+                        n_aligned=n_source["cache"] + n_source["nwg"], n_hit=n_source["cache"], n_miss=n_source["nwg"]))
+                    tx_acs = set()
+                    n0, t0 = n1, t1
+        except KeyboardInterrupt:
+            if pool is not None:
+                pool.terminate()
+                pool = None
+            if r is not None:
+                _commit(r.tx_ac)
+                logger.warning("interrupted; committed through {ac}; rerun to resume".format(ac=r.tx_ac))
+            raise
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+            pool = None
+        _insert_exon_alns(cur, aln_ins_sql, ins_rows)
+        _set_meta_value(cur, ckpt_key, None)
+        con.commit()
+    finally:
+        # on failure, workers are stopped rather than drained.  The WITH
+        # HOLD cursor would otherwise outlive its transaction on the
+        # pooled connection; it survives the rollback only if it was
+        # committed, and psycopg2 can close only a cursor that exists.
+        if pool is not None:
+            pool.terminate()
+        con.rollback()
+        if sel_cur is not None:
+            cur.execute("select 1 from pg_cursors where name = %s", [sel_cur.name])
+            if cur.fetchone() is not None:
+                sel_cur.close()
+        cur.execute("close all")
+        cur.close()
+        con.close()
 
-        added = datetime.datetime.now()
-        cur.execute(aln_ins_sql, [r.tx_exon_id, r.alt_exon_id, cigar_str, added])
-        tx_acs.add(r.tx_ac)
-
-        if i_r > 0 and (i_r % update_period == 0 or (i_r + 1) == n_rows):
-            con.commit()
-            n1, t1 = i_r, time.time()
-            nd, td = n1 - n0, t1 - t0
-            aln_rate = nd / td      # aln rate on this update period
-            if aln_rate_s is None:  # aln_rate_s is EWMA smoothed average
-                aln_rate_s = aln_rate
-            else:
-                aln_rate_s = decay_rate * aln_rate + (1.0 - decay_rate) * aln_rate_s
-            etr = (n_rows - i_r - 1) / aln_rate_s        # etr in secs
-            etr_s = str(datetime.timedelta(seconds=round(etr)))  # etr as H:M:S
-            logger.info("{i_r}/{n_rows} {p_r:.1f}%; committed; speed={speed:.1f}/{speed_s:.1f} aln/sec (inst/emwa); etr={etr:.0f}s ({etr_s}); {n_tx} tx".format(
-                i_r=i_r, n_rows=n_rows, p_r=i_r / n_rows * 100, speed=aln_rate, speed_s=aln_rate_s, etr=etr,
-                etr_s=etr_s, n_tx=len(tx_acs)))
-            tx_acs = set()
-            n0, t0 = n1, t1
-
-    cur.close()
-    con.close()
     logger.info("{} distinct sequence accessions not found".format(len(ac_warning)))
+    logger.info("{n_ungapped}/{n_aligned} ungapped/aligned; cache {n_hit}/{n_miss} hit/miss".format(
+        n_ungapped=n_source["ungapped"], n_aligned=n_source["cache"] + n_source["nwg"],
+        n_hit=n_source["cache"], n_miss=n_source["nwg"]))
 
 
 def analyze(session, opts, cf):
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
     cmds = [
         "analyze verbose"
     ]
@@ -163,13 +245,8 @@ def analyze(session, opts, cf):
 
 def create_schema(session, opts, cf):
     """Create and populate initial schema"""
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     if session.bind.name == "postgresql" and usam.use_schema:
         session.execute("create schema " + usam.schema_name)
-        session.execute("set search_path = " + usam.schema_name)
         session.commit()
 
     usam.Base.metadata.create_all(session.bind)
@@ -185,10 +262,6 @@ def create_schema(session, opts, cf):
 
 def drop_schema(session, opts, cf):
     if session.bind.name == "postgresql" and usam.use_schema:
-        session.execute(
-            "set role {admin_role};".format(admin_role=cf.get("uta", "admin_role")))
-        session.execute("set search_path = " + usam.schema_name)
-
         ddl = "drop schema if exists " + usam.schema_name + " cascade"
         session.execute(ddl)
         session.commit()
@@ -198,10 +271,6 @@ def drop_schema(session, opts, cf):
 def grant_permissions(session, opts, cf):
     schema = usam.schema_name
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     cmds = [
         # alter db doesn't belong here, and probably better to avoid the implicit behevior this encourages
         # "alter database {db} set search_path = {schema}".format(db=cf.get("uta", "database"),schema=schema),
@@ -243,21 +312,23 @@ def load_exonset(session, opts, cf):
 
     update_period = 25
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
+    if opts.get("--bulk"):
+        return _load_exonset_bulk(session, opts, cf)
 
-    n_rows = len(gzip.open(opts["FILE"]).readlines()) - 1
-    esr = ufes.ExonSetReader(gzip.open(opts["FILE"]))
+    esr, src = _open_records(opts, cf, ufes.ExonSetReader)
     logger.info("opened " + opts["FILE"])
 
+    es_index = _fetch_exon_set_index(session)
+
     n_new = 0
     n_unchanged = 0
     n_deprecated = 0
     n_errors = 0
+    i_es = -1
     for i_es, es in enumerate(esr):
         try:
-            n, o = _upsert_exon_set_record(session, es.tx_ac, es.alt_ac, es.strand, es.method, es.exons_se_i)
+            n, o = _upsert_exon_set_record(session, es.tx_ac, es.alt_ac, es.strand, es.method, es.exons_se_i,
+                                           es_index=es_index)
             session.commit()
         except IntegrityError as e:
             logger.exception(e)
@@ -272,34 +343,63 @@ def load_exonset(session, opts, cf):
             elif no == (False, True):
                 n_unchanged += 1
 
-            if i_es % update_period == 0 or i_es + 1 == n_rows:
-                logger.info("{i_es}/{n_rows} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, {n_deprecated} deprecated, {n_errors} n_errors".format(
-                    i_es=i_es, n_rows=n_rows,
+            if i_es % update_period == 0:
+                logger.info("{i_es} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, {n_deprecated} deprecated, {n_errors} n_errors".format(
+                    i_es=i_es,
                     n_new=n_new, n_unchanged=n_unchanged, n_deprecated=n_deprecated, n_errors=n_errors,
-                    p=(i_es + 1) / n_rows * 100))
+                    p=src.progress() * 100))
     session.commit()
+    src.close()
+    logger.info("{n_rows}/{n_rows} 100.0%; {n_new} new, {n_unchanged} unchanged, {n_deprecated} deprecated, {n_errors} n_errors".format(
+        n_rows=i_es + 1,
+        n_new=n_new, n_unchanged=n_unchanged, n_deprecated=n_deprecated, n_errors=n_errors))
 
 
 def load_geneinfo(session, opts, cf):
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
+    """load gene records from a geneinfo file
+
+    Rows are streamed into a staging table with COPY and merged into
+    gene with one insert ... on conflict; if a gene appears more than
+    once in the file, the last row wins.
 
-    gir = ufgi.GeneInfoReader(gzip.open(opts["FILE"]))
+    """
+    gir, src = _open_records(opts, cf, ufgi.GeneInfoReader)
     logger.info("opened " + opts["FILE"])
 
-    for i_gi, gi in enumerate(gir):
-        session.merge(
-            usam.Gene(
-                hgnc=gi.hgnc,
-                maploc=gi.maploc,
-                descr=gi.descr,
-                summary=gi.summary,
-                aliases=gi.aliases,
-            ))
-        logger.info("Added {gi.hgnc} ({gi.summary})".format(gi=gi))
+    cur = session.connection().connection.cursor()
+    cur.execute("""
+    create temporary table gene_stage (
+        ord integer not null, hgnc text not null, maploc text, descr text, summary text, aliases text[]
+    ) on commit drop
+    """)
+    _copy_rows(cur, "gene_stage", ["ord", "hgnc", "maploc", "descr", "summary", "aliases"],
+               ((i_gi, gi.hgnc, gi.maploc, gi.descr, gi.summary, _pg_array_literal(gi.aliases))
+                for i_gi, gi in enumerate(gir)))
+    src.close()
+    cur.execute("select count(*), count(distinct hgnc) from gene_stage")
+    n_rows, n_genes = cur.fetchone()
+
+    # aliases are stored as the text form of an array, as when a list
+    # is bound to the text column
+    cur.execute("""
+    insert into gene (hgnc, maploc, descr, summary, aliases, added)
+    select distinct on (hgnc) hgnc, maploc, descr, summary, aliases::text, now()
+    from gene_stage
+    order by hgnc, ord desc
+    on conflict (hgnc) do update
+        set maploc = excluded.maploc, descr = excluded.descr, summary = excluded.summary, aliases = excluded.aliases
+        where (gene.maploc, gene.descr, gene.summary, gene.aliases)
+              is distinct from (excluded.maploc, excluded.descr, excluded.summary, excluded.aliases)
+    returning (xmax = 0)
+    """)
+    n_new = sum(1 for inserted, in cur.fetchall() if inserted)
+    n_changed = cur.rowcount - n_new
     session.commit()
 
+    logger.info("{n_rows} rows, {n_genes} genes; {n_new} new, {n_changed} changed, {n_unchanged} unchanged".format(
+        n_rows=n_rows, n_genes=n_genes, n_new=n_new, n_changed=n_changed,
+        n_unchanged=n_genes - n_new - n_changed))
+
 
 def load_ncbi_geneinfo(session, opts, cf):
     """
@@ -307,10 +407,6 @@ def load_ncbi_geneinfo(session, opts, cf):
     ftp://ftp.ncbi.nlm.nih.gov/gene/DATA/gene_info.gz
     """
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     gip = uta.parsers.geneinfo.GeneInfoParser(gzip.open(opts["FILE"]))
     for gi in gip:
         if gi["tax_id"] != "9606" or gi["Symbol_from_nomenclature_authority"] == "-":
@@ -360,24 +456,16 @@ def load_ncbi_seqgene(session, opts, cf):
         ti["exon_se_i"] = [s[1:3] for s in segs]
         return ti
 
-
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     o_refseq = session.query(usam.Origin).filter(
         usam.Origin.name == "NCBI RefSeq").one()
 
     sg_filter = lambda r: (r["transcript"].startswith("NM_")
                            and r["group_label"] == "GRCh37.p10-Primary Assembly"
                            and r["feature_type"] in ["CDS", "UTR"])
-    sgparser = uta.parsers.seqgene.SeqGeneParser(gzip.open(opts["FILE"]),
-                                                 filter=sg_filter)
-    slurp = sorted(list(sgparser),
-                   key=lambda r: (r["transcript"], r["group_label"], r["chr_start"], r["chr_stop"]))
-    for k, i in itertools.groupby(slurp, key=lambda r: (r["transcript"], r["group_label"])):
-        ac, assy = k
-        ti = _seqgene_recs_to_tx_info(ac, assy, list(i))
+    sgparser = uta.parsers.seqgene.SeqGeneBlockParser(gzip.open(opts["FILE"]),
+                                                      filter=sg_filter)
+    for ac, assy, recs in sgparser:
+        ti = _seqgene_recs_to_tx_info(ac, assy, recs)
 
         resp = session.query(usam.Transcript).filter(usam.Transcript.ac == ac)
         if resp.count() == 0:
@@ -403,10 +491,6 @@ def load_origin(session, opts, cf):
     def _none_if_empty(s):
         return None if s == "" else s
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     orir = csv.DictReader(open(opts["FILE"]), delimiter=b'\t')
     for rec in orir:
         ori = usam.Origin(name=rec["name"],
@@ -426,150 +510,245 @@ def load_origin(session, opts, cf):
 
 
 def load_seqinfo(session, opts, cf):
-    """load Seq entries with accessions from fasta file
-    """
+    """load Seq and SeqAnno entries from a seqinfo file
 
-    # TODO: load_seqinfo is horrifically slow (via sqlalchemy). There
-    # must be a better way.
+    The file is streamed into a staging table (origins resolved via a
+    cache of origin ids); grouping by md5 is left to the database.
+    Sequences for md5s not already in seq are fetched from SeqRepo
+    and COPYed in, then annotations are merged with a single insert
+    ... on conflict.
 
-    update_period = 100
+    """
 
     # TODO: Don't store sequences in UTA
     # load sequences up to max_len in size
     # 2e6 was chosen empirically based on sizes of NMs, NGs, NWs, NTs, NCs
     max_len = int(2e6)
+    update_period = 10000
 
+    origin_ids = dict(session.execute("select name, origin_id from origin").fetchall())
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
-    n_rows = len(gzip.open(opts["FILE"]).readlines()) - 1
+    def _origin_id(si):
+        try:
+            return origin_ids[si.origin]
+        except KeyError:
+            raise NoResultFound("No origin for " + si.origin)
 
-    sir = ufsi.SeqInfoReader(gzip.open(opts["FILE"]))
+    sir, src = _open_records(opts, cf, ufsi.SeqInfoReader)
     logger.info("opened " + opts["FILE"])
 
+    con = session.connection().connection
+    cur = con.cursor()
+
+    # 1. Stage seqinfo rows
+    cur.execute("""
+    create temporary table seqinfo_stage (
+        md5 text not null, origin_id integer not null, ac text not null, descr text, len integer not null
+    ) on commit drop
+    """)
+    _copy_rows(cur, "seqinfo_stage", ["md5", "origin_id", "ac", "descr", "len"],
+               ((si.md5, _origin_id(si), si.ac, si.descr, si.len) for si in sir))
+    src.close()
+    cur.execute("analyze seqinfo_stage")
+    cur.execute("select count(*), count(distinct md5) from seqinfo_stage")
+    n_rows, n_md5 = cur.fetchone()
+    logger.info("staged {n_rows} seqinfo rows for {n_md5} sequences".format(n_rows=n_rows, n_md5=n_md5))
+
+    # 2. Refuse accessions that would change sequence, as before
+    cur.execute("""
+    select O.name, S.ac, S.md5, coalesce(A.seq_id, S2.md5)
+    from seqinfo_stage S
+    join origin O on O.origin_id = S.origin_id
+    left join seq_anno A on A.origin_id = S.origin_id and A.ac = S.ac and A.seq_id != S.md5
+    left join seqinfo_stage S2 on S2.origin_id = S.origin_id and S2.ac = S.ac and S2.md5 != S.md5
+    where A.seq_anno_id is not null or S2.md5 is not null
+    limit 1
+    """)
+    row = cur.fetchone()
+    if row is not None:
+        raise RuntimeError("{r[0]}:{r[1]} for {r[2]}: accession already exists for {r[3]}".format(r=row))
+
+    # 3. Fetch and stage sequences for new md5s, one accession per md5
     sf = _get_seqfetcher(cf)
+    sel_cur = con.cursor("load_seqinfo")
+    sel_cur.itersize = update_period
+    sel_cur.execute("""
+    select distinct on (md5) md5, ac, len from seqinfo_stage S
+    where not exists (select 1 from seq where seq_id = S.md5)
+    order by md5, ac
+    """)
+    n_seqs = collections.Counter()
+
+    def _new_seqs():
+        for md5, ac, seq_len in sel_cur:
+            seq = str(sf[ac]).upper()
+            if seq_len != len(seq):
+                logger.error("Expected a sequence of length {seq_len} for {md5}; got length {len2} for {ac}; skipping".format(
+                    seq_len=seq_len, md5=md5, len2=len(seq), ac=ac))
+                n_seqs["skipped"] += 1
+                continue
+            n_seqs["new"] += 1
+            if n_seqs["new"] % update_period == 0:
+                logger.info("fetched {n} new sequences".format(n=n_seqs["new"]))
+            yield md5, len(seq), seq if len(seq) < max_len else None
+
+    cur.execute("create temporary table seq_stage (seq_id text primary key, len integer not null, seq text) on commit drop")
+    _copy_rows(cur, "seq_stage", ["seq_id", "len", "seq"], _new_seqs())
+    sel_cur.close()
+
+    # 4. Merge
+    cur.execute("insert into seq (seq_id, len, seq) select seq_id, len, seq from seq_stage on conflict do nothing")
+    cur.execute("""
+    insert into seq_anno (origin_id, seq_id, ac, descr, added)
+    select distinct on (S.origin_id, S.ac) S.origin_id, S.md5, S.ac, S.descr, now()
+    from seqinfo_stage S
+    join seq on seq.seq_id = S.md5
+    order by S.origin_id, S.ac, S.descr desc
+    on conflict (origin_id, ac) do update set descr = excluded.descr
+        where excluded.descr != '' and seq_anno.descr is distinct from excluded.descr
+    returning (xmax = 0)
+    """)
+    n_created = sum(1 for inserted, in cur.fetchall() if inserted)
+    n_updated = cur.rowcount - n_created
+    session.commit()
 
-    _md5_seq_cache = {}
-    def _upsert_seq(si):
-        if si.md5 in _md5_seq_cache:
-            return _md5_seq_cache[si.md5]
-
-        u_seq = session.query(usam.Seq).filter(usam.Seq.seq_id == md5).first()
-        if u_seq is None:
-            seq = str(sf[si.ac]).upper()
-            if int(si.len) != len(seq):
-                raise RuntimeError("Expected a sequence of length {si.len} for {si.md5}; got length {len2} for {si.ac}; skipping".format(
-                    si=si, len2=len(seq)))
-            iseq = seq if len(seq) < max_len else None
-            u_seq = usam.Seq(seq_id=si.md5, len=si.len, seq=iseq)
-            session.add(u_seq)
-        _md5_seq_cache[si.md5] = u_seq
-        return _md5_seq_cache[si.md5]
-
-    i_md5 = 0
-    n_created = 0
-    for md5, si_iter in itertools.groupby(sorted(sir, key=lambda si: si.md5),
-                                          key=lambda si: si.md5):
-        sis = list(si_iter)
-    
-        # if sequence doesn't exist in sequence table, make it
-        # this is to satisfy a FK dependency, which should be reconsidered
-        si = sis[0]
-        try:
-            u_seq = _upsert_seq(si)
-        except RuntimeError as e:
-            logger.exception(e)
-            continue
-
-        for si in sis:
-            u_ori = session.query(usam.Origin).filter(
-                usam.Origin.name == si.origin).one()
-            u_seqanno = session.query(usam.SeqAnno).filter(
-                usam.SeqAnno.origin_id == u_ori.origin_id,
-                usam.SeqAnno.ac == si.ac).first()
-            logger.debug("seq_anno({si.origin},{si.ac},{si.md5}) {st}".format(
-                si=si, st="exists" if u_seqanno is not None else "doesn't exist"))
-            if u_seqanno:
-                # update descr, perhaps
-                if u_seqanno.seq_id != si.md5:
-                    raise RuntimeError("{si.origin}:{si.ac} for {si.md5}: accession already exists for {seq_id}".format(
-                        si=si, seq_id=u_seqanno.seq_id))
-                if si.descr and u_seqanno.descr != si.descr:
-                    u_seqanno.descr = si.descr
-                    session.merge(u_seqanno)
-            else:
-                # create the new annotation
-                u_seqanno = usam.SeqAnno(origin_id=u_ori.origin_id, seq_id=si.md5,
-                                         ac=si.ac, descr=si.descr)
-                session.add(u_seqanno)
-                n_created += 1
-
-        i_md5 += 1
-        if i_md5 % update_period == 1:
-            logger.info("{n_created} annotations created/{i_md5} sequences seen ({p:.1f}%)/{n_rows} sequences total".format(
-                n_created=n_created, i_md5=i_md5, n_rows=n_rows, md5=md5, p=i_md5 / n_rows * 100))
-            session.commit()
+    logger.info("{n_created} annotations created, {n_updated} updated; "
+                "{n_new} sequences created, {n_skipped} skipped/{n_md5} sequences total".format(
+                    n_created=n_created, n_updated=n_updated, n_new=n_seqs["new"],
+                    n_skipped=n_seqs["skipped"], n_md5=n_md5))
 
 
 def load_sequences(session, opts, cf):
+    """load sequences into seq rows that lack them
+
+    Pending seq_ids are streamed from a server-side cursor, sequences
+    are fetched in batches (in --workers processes if > 1), and results
+    are written back with batched UPDATE ... FROM (VALUES ...),
+    committing every --commit-interval sequences.
+
+    """
 
     # TODO: Don't store sequences in UTA
     # load sequences up to max_len in size
     # 2e6 was chosen empirically based on sizes of NMs, NGs, NWs, NTs, NCs
     max_len = int(2e6)
+    batch_size = 100
+    fetch_size = 1000
+    max_update_bytes = 64 * 2**20
+    commit_interval = int(opts.get("--commit-interval") or 1000)
+    n_workers = int(opts.get("--workers") or 1)
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
-    sf = _get_seqfetcher(cf)
-
-    # fetch accessions for given sequences
-    sql = """
-    select S.seq_id,S.len,array_agg(SA.ac order by SA.ac~'^ENST',SA.ac) as acs
-    from seq S
-    join seq_anno SA on S.seq_id=SA.seq_id
-    where S.len <= {max_len} and S.seq is NULL
-    group by S.seq_id,len
-    """.format(max_len=max_len)
-
-    def _fetch_first(acs):
-        # try all accessions in acs, return sequence of first that returns a
-        # sequence
-        for ac in row["acs"]:
-            try:
-                return sf.fetch(ac)
-            except KeyError:
-                pass
-        return None
+    con = session.bind.pool.connect()
+    cur = con.cursor()
+
+    try:
+        # fetch accessions for given sequences
+        where_sql = "S.len <= {max_len} and S.seq is NULL".format(max_len=max_len)
+        cur.execute("select count(*) from seq S where " + where_sql)
+        n_rows = cur.fetchone()[0]
+        if n_rows == 0:
+            logger.info("no sequences to load")
+            return
+        logger.info("{} sequences to load".format(n_rows))
+
+        sel_cur = con.cursor("load_sequences", withhold=True)
+        sel_cur.itersize = fetch_size
+        sel_cur.execute("""
+        select S.seq_id,S.len,array_agg(SA.ac order by SA.ac~'^ENST',SA.ac) as acs
+        from seq S
+        join seq_anno SA on S.seq_id=SA.seq_id
+        where {where}
+        group by S.seq_id,len
+        """.format(where=where_sql))
+        batches = chunks(sel_cur, batch_size)
+
+        if n_workers > 1:
+            logger.info("fetching with {n} worker processes".format(n=n_workers))
+            pool = multiprocessing.Pool(n_workers, initializer=_seqfetcher_worker_init, initargs=(cf,))
+            results = itertools.chain.from_iterable(
+                imap_bounded(pool, _fetch_first_seqs, batches, max_pending=4 * n_workers))
+        else:
+            pool = None
+            _seqfetcher_init(cf)
+            results = itertools.chain.from_iterable(six.moves.map(_fetch_first_seqs, batches))
+
+        upd_rows = []
+        n_upd_bytes = 0
+        n_loaded = n_bytes = n_errors = 0
+        rate_s = None
+        decay_rate = 0.25
+        i_r, n0, t0 = 0, 0, time.time()
+
+        def _update():
+            if not upd_rows:
+                return
+            psycopg2.extras.execute_values(cur, """
+            update seq S set seq = V.seq from (values %s) V(seq_id, seq) where S.seq_id = V.seq_id
+            """, upd_rows, page_size=batch_size)
+            del upd_rows[:]
 
-    for row in session.execute(sql):
-        seq = _fetch_first(row["acs"])
-        if seq is None:
-            logger.warn("No sequence found for {acs}".format(acs=row["acs"]))
-            continue
-        seq = seq.upper()
-        if row["len"] != len(seq):
-            logger.error("Expected a sequence of length {len} for {md5} ({acs}); got sequence of length {len2}".format(
-                len=row["len"], md5=row["seq_id"], acs=row["acs"], len2=len(seq)))
-            continue
-        assert row["len"] == len(seq), "expected a sequence of length {len} for {md5} ({acs}); got length {len2}".format(
-            len=row["len"], md5=row["seq_id"], acs=row["acs"], len2=len(seq))
-        session.execute(usam.Seq.__table__.update().values(
-            seq=seq).where(usam.Seq.seq_id == row["seq_id"]))
-        logger.info("loaded sequence of length {len} for {md5} ({acs})".format(
-            len=len(seq), md5=row["seq_id"], acs=row["acs"]))
-        session.commit()
+        try:
+            for i_r, (seq_id, seq_len, acs, seq) in enumerate(results, 1):
+                if seq is None:
+                    logger.warn("No sequence found for {acs}".format(acs=acs))
+                    n_errors += 1
+                elif seq_len != len(seq):
+                    logger.error("Expected a sequence of length {len} for {md5} ({acs}); got sequence of length {len2}".format(
+                        len=seq_len, md5=seq_id, acs=acs, len2=len(seq)))
+                    n_errors += 1
+                else:
+                    upd_rows.append((seq_id, seq))
+                    n_upd_bytes += len(seq)
+                    n_loaded += 1
+                    n_bytes += len(seq)
+                    logger.debug("loaded sequence of length {len} for {md5} ({acs})".format(
+                        len=len(seq), md5=seq_id, acs=acs))
+
+                if n_upd_bytes >= max_update_bytes or len(upd_rows) >= batch_size:
+                    _update()
+                    n_upd_bytes = 0
+
+                if i_r % commit_interval == 0 or i_r == n_rows:
+                    _update()
+                    n_upd_bytes = 0
+                    con.commit()
+                    n1, t1 = i_r, time.time()
+                    rate = (n1 - n0) / (t1 - t0)  # seq rate on this commit interval
+                    rate_s = rate if rate_s is None else decay_rate * rate + (1.0 - decay_rate) * rate_s
+                    etr = (n_rows - i_r) / rate_s if rate_s else 0
+                    etr_s = str(datetime.timedelta(seconds=round(etr)))
+                    logger.info("{i_r}/{n_rows} {p_r:.1f}%; committed; speed={speed:.1f}/{speed_s:.1f} seq/sec (inst/emwa); "
+                                "etr={etr:.0f}s ({etr_s}); {n_loaded} loaded ({mb:.1f} MB), {n_errors} errors".format(
+                                    i_r=i_r, n_rows=n_rows, p_r=i_r / n_rows * 100, speed=rate, speed_s=rate_s,
+                                    etr=etr, etr_s=etr_s, n_loaded=n_loaded, mb=n_bytes / 2**20, n_errors=n_errors))
+                    n0, t0 = n1, t1
+        except KeyboardInterrupt:
+            if pool is not None:
+                pool.terminate()
+            _update()
+            con.commit()
+            logger.warning("interrupted; committed {n} sequences; rerun to resume".format(n=n_loaded))
+            raise
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+        _update()
+        con.commit()
+    finally:
+        # CLOSE ALL also closes the WITH HOLD cursor, which would
+        # otherwise outlive its transaction on the pooled connection
+        con.rollback()
+        cur.execute("close all")
+        cur.close()
+        con.close()
+
+    logger.info("{n_loaded} sequences loaded ({mb:.1f} MB); {n_errors} errors".format(
+        n_loaded=n_loaded, mb=n_bytes / 2**20, n_errors=n_errors))
 
 
 def load_sql(session, opts, cf):
     """Create views"""
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
-
     for fn in opts["FILES"]:
         logger.info("loading " + fn)
         session.execute(open(fn).read())
@@ -591,20 +770,20 @@ def load_txinfo(session, opts, cf):
             raise e
         return ori
 
+    if opts.get("--bulk"):
+        return _load_txinfo_bulk(session, opts, cf)
 
-    n_rows = len(gzip.open(opts["FILE"]).readlines()) - 1
-    tir = ufti.TxInfoReader(gzip.open(opts["FILE"]))
+    tir, src = _open_records(opts, cf, ufti.TxInfoReader)
     logger.info("opened " + opts["FILE"])
 
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
+    es_index = _fetch_exon_set_index(session, method=self_aln_method)
 
     n_new = 0
     n_unchanged = 0
     n_cds_changed = 0
     n_exons_changed = 0
 
+    i_ti = -1
     for i_ti, ti in enumerate(tir):
         if ti.exons_se_i == "":
             logger.warning(ti.ac + ": no exons?!; skipping.")
@@ -630,6 +809,8 @@ def load_txinfo(session, opts, cf):
                 u_tx.ac = "{u_tx.ac}/{u_tx.cds_start_i}..{u_tx.cds_end_i}".format(u_tx=u_tx)
                 logger.warn("Transcript {ti.ac}: CDS coordinates changed!; renamed to {u_tx.ac}".format(ti=ti, u_tx=u_tx))
                 session.flush()
+                # exon_set.tx_ac was renamed by FK cascade
+                _rekey_exon_set_index(es_index, ti.ac, u_tx.ac)
                 u_tx = None
                 n_cds_changed += 1
 
@@ -669,7 +850,8 @@ def load_txinfo(session, opts, cf):
         # state: transcript now exists, either existing or freshly-created
 
         # 2. Upsert an ExonSet attached to the Transcript
-        n, o = _upsert_exon_set_record(session, ti.ac, ti.ac, 1, self_aln_method, ti.exons_se_i)
+        n, o = _upsert_exon_set_record(session, ti.ac, ti.ac, 1, self_aln_method, ti.exons_se_i,
+                                       es_index=es_index)
 
         (no) = (n is not None, o is not None)
         if no == (True, False):
@@ -681,22 +863,24 @@ def load_txinfo(session, opts, cf):
             logger.debug("Transcript {ti.ac} exon structure unchanged".format(ti=ti))
             n_unchanged += 1
 
-        if i_ti % update_period == 0 or i_ti + 1 == n_rows:
+        if i_ti % update_period == 0:
             session.commit()
-            logger.info("{i_ti}/{n_rows} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, "
+            logger.info("{i_ti} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, "
                         "{n_cds_changed} cds changed, {n_exons_changed} exons changed; commited".format(
-                i_ti=i_ti, n_rows=n_rows,
+                i_ti=i_ti,
                 n_new=n_new, n_unchanged=n_unchanged, n_cds_changed=n_cds_changed, n_exons_changed=n_exons_changed,
-                p=(i_ti + 1) / n_rows * 100))
-            
+                p=src.progress() * 100))
 
+    session.commit()
+    src.close()
+    logger.info("{n_rows}/{n_rows} 100.0%; {n_new} new, {n_unchanged} unchanged, "
+                "{n_cds_changed} cds changed, {n_exons_changed} exons changed; commited".format(
+        n_rows=i_ti + 1,
+        n_new=n_new, n_unchanged=n_unchanged, n_cds_changed=n_cds_changed, n_exons_changed=n_exons_changed))
 
 
-def refresh_matviews(session, opts, cf):
-    session.execute("set role {admin_role};".format(
-        admin_role=cf.get("uta", "admin_role")))
-    session.execute("set search_path = " + usam.schema_name)
 
+def refresh_matviews(session, opts, cf):
     # matviews must be updated in dependency order. Unfortunately,
     # it's difficult to determine this programmatically. The "right"
     # solution is a recursive CTE, but I was unable to find or write
@@ -712,6 +896,7 @@ def refresh_matviews(session, opts, cf):
     cmds = [
         # N.B. Order matters!
         "refresh materialized view exon_set_exons_fp_mv",
+        "refresh materialized view exon_set_span_mv",
         "refresh materialized view tx_exon_set_summary_mv",
         "refresh materialized view tx_def_summary_mv",
         # "refresh materialized view tx_aln_cigar_mv",
@@ -740,8 +925,199 @@ def _get_seqrepo(cf):
 _get_seqfetcher = _get_seqrepo
 
 
+def _get_exon_aln_cache(cf):
+    if not cf.has_option("loading", "exon_aln_cache"):
+        return None
+    cache = ExonAlnCache(cf.get("loading", "exon_aln_cache"))
+    logger.info("Opened {cache}".format(cache=cache))
+    return cache
+
+
+def _open_input(opts, cf):
+    """return an InputSource for opts["FILE"], decompressed with
+    [loading] decompress_threads threads if configured"""
+    threads = 1
+    if cf.has_option("loading", "decompress_threads"):
+        threads = cf.getint("loading", "decompress_threads")
+    return InputSource(opts["FILE"], threads=threads)
+
+
+def _open_records(opts, cf, reader_class):
+    """return (reader, src) for opts["FILE"]: a ColumnarReader (which
+    is also its own src) if the file is columnar, otherwise
+    reader_class over an InputSource"""
+    if ufcol.is_columnar(opts["FILE"]):
+        rdr = ufcol.ColumnarReader(opts["FILE"])
+        if rdr.record_class is not reader_class.record_class:
+            raise UTAError("{fn}: expected {exp} records; got {got}".format(
+                fn=opts["FILE"], exp=reader_class.record_class.__name__, got=rdr.type_name))
+        return rdr, rdr
+    src = _open_input(opts, cf)
+    return reader_class(src), src
+
+
+# align_exons helpers
+# These are module-level (rather than nested in align_exons) so that
+# they may be pickled and run in multiprocessing worker processes.
+
+_ExonPair = collections.namedtuple("_ExonPair", [
+    "tx_ac", "tx_start_i", "tx_end_i", "tx_exon_id",
+    "alt_ac", "alt_start_i", "alt_end_i", "alt_exon_id", "alt_strand"])
+
+_align_sf = None                # per-process SeqWindowCache-wrapped sequence fetcher
+_align_cache = None             # per-process ExonAlnCache, if configured
+
+
+def _align_exon_pairs_init(cf):
+    global _align_sf, _align_cache
+    _align_sf = SeqWindowCache(_get_seqfetcher(cf))
+    _align_cache = _get_exon_aln_cache(cf)
+
+
+def _align_exon_pairs_worker_init(cf):
+    # SIGINT is handled by the parent, which commits before exiting
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _align_exon_pairs_init(cf)
+
+
+def _align_exon_pairs(pairs):
+    """align a batch of _ExonPairs; returns list of (pair, cigar_str,
+    missing_ac, source) tuples in input order, where exactly one of
+    cigar_str and missing_ac is None, and source names how the cigar
+    was obtained ("ungapped", "cache", or "nwg")
+
+    """
+    _prefetch_exon_pairs(_align_sf, pairs)
+    results = [_align_exon_pair(_align_sf, _align_cache, p) for p in pairs]
+    if _align_cache is not None:
+        _align_cache.commit()
+    return results
+
+
+def _prefetch_exon_pairs(sf, pairs):
+    """load whole transcript sequences and, for each (tx_ac, alt_ac)
+    exon set, the genomic window spanning its exons into SeqWindowCache
+    sf, so that exons are sliced from memory rather than fetched
+    individually
+
+    """
+    alt_spans = collections.OrderedDict()
+    for p in pairs:
+        k = (p.tx_ac, p.alt_ac)
+        s, e = alt_spans.get(k, (p.alt_start_i, p.alt_end_i))
+        alt_spans[k] = (min(s, p.alt_start_i), max(e, p.alt_end_i))
+    for (tx_ac, alt_ac), (s, e) in alt_spans.items():
+        sf.prefetch(tx_ac)
+        sf.prefetch(alt_ac, s, e)
+
+
+def _align_exon_pair(sf, aln_cache, p):
+    try:
+        tx_seq = _fetch_seq(sf, p.tx_ac, p.tx_start_i, p.tx_end_i)
+    except KeyError:
+        return (p, None, p.tx_ac, None)
+
+    try:
+        alt_seq = _fetch_seq(sf, p.alt_ac, p.alt_start_i, p.alt_end_i)
+    except KeyError:
+        return (p, None, p.alt_ac, None)
+
+    if p.alt_strand == MINUS_STRAND:
+        alt_seq = reverse_complement(alt_seq)
+    tx_seq = tx_seq.upper()
+    alt_seq = alt_seq.upper()
+
+    cigar_str = _ungapped_cigar(tx_seq, alt_seq)
+    if cigar_str is not None:
+        return (p, cigar_str, None, "ungapped")
+
+    if aln_cache is not None:
+        key = (seq_md5(tx_seq), seq_md5(alt_seq))
+        cigar_str = aln_cache.get(*key)
+        if cigar_str is not None:
+            return (p, cigar_str, None, "cache")
+
+    score, cigar = utaaa.needleman_wunsch_gotoh_align(str(tx_seq),
+                                                      str(alt_seq),
+                                                      extended_cigar=True)
+    cigar_str = cigar.to_string()
+    if aln_cache is not None:
+        aln_cache.put(key[0], key[1], cigar_str)
+    return (p, cigar_str, None, "nwg")
+
+
+def _ungapped_cigar(s1, s2, max_mismatches=1):
+    """return extended cigar string for the ungapped alignment of s1 and
+    s2 if they are the same length and differ by at most max_mismatches
+    substitutions, or None otherwise
+
+    An alignment of equal-length sequences with gaps must contain at
+    least one insertion and one deletion.  Under the aligner's scoring,
+    that costs more than one mismatch, so for max_mismatches <= 1 the
+    ungapped alignment is the unique optimum and this cigar is identical
+    to that from needleman_wunsch_gotoh_align.
+
+    >>> print(_ungapped_cigar("ACGT", "ACGT"))
+    4=
+    >>> print(_ungapped_cigar("ACGTACGT", "ACCTACGT"))
+    2=1X5=
+    >>> _ungapped_cigar("ACGTACGT", "ACCTACCT") is None
+    True
+    >>> _ungapped_cigar("ACGT", "ACG") is None
+    True
+
+    """
+    if len(s1) != len(s2):
+        return None
+    if s1 == s2:
+        return "{n}=".format(n=len(s1))
+    mm = [i for i, (c1, c2) in enumerate(six.moves.zip(s1, s2)) if c1 != c2]
+    if len(mm) > max_mismatches:
+        return None
+    ops = []
+    p = 0
+    for i in mm:
+        if i > p:
+            ops.append("{n}=".format(n=i - p))
+        ops.append("1X")
+        p = i + 1
+    if p < len(s1):
+        ops.append("{n}=".format(n=len(s1) - p))
+    return "".join(ops)
+
+
+def _fetch_seq(sf, ac, s, e):
+    logger.debug("fetching sequence {ac}[{s}:{e}]".format(ac=ac,s=s,e=e))
+    seq = sf.fetch(ac,s,e)
+    assert seq is not None, "sequence {ac}[{s}:{e}] should never be None (coordinates bogus?)".format(ac=ac,s=s,e=e)
+    if isinstance(seq, six.binary_type):
+        seq = seq.decode("ascii")  # force into unicode
+    assert isinstance(seq, six.text_type)
+    return seq
+
+
+def _get_meta_value(cur, key):
+    cur.execute("select value from meta where key = %s", [key])
+    row = cur.fetchone()
+    return None if row is None else row[0]
+
 
-def _upsert_exon_set_record(session, tx_ac, alt_ac, strand, method, ess):
+def _set_meta_value(cur, key, value):
+    """set meta key to value, or delete key if value is None"""
+    cur.execute("delete from meta where key = %s", [key])
+    if value is not None:
+        cur.execute("insert into meta (key, value) values (%s, %s)", [key, value])
+
+
+def _insert_exon_alns(cur, sql, rows):
+    """insert buffered exon_aln rows with one multi-row statement per
+    page, then empty the buffer"""
+    if rows:
+        psycopg2.extras.execute_values(cur, sql, rows, page_size=1000)
+        del rows[:]
+
+
+def _upsert_exon_set_record(session, tx_ac, alt_ac, strand, method, ess, es_index=None):
 
     """idempotent insert into exon_set and exon tables, archiving prior records if needed;
     returns tuple of (new_record, old_record) as follows:
@@ -749,9 +1125,17 @@ def _upsert_exon_set_record(session, tx_ac, alt_ac, strand, method, ess):
     (new, None) -- no prior record; new was inserted
     (None, old) -- prior record and unchaged; nothing was inserted
     (new, old)  -- prior record existed and was changed
+
+    If es_index (from _fetch_exon_set_index) is given, existing exon
+    sets are looked up there instead of in the database, and the index
+    is updated with changes; in that case, old is the ExonSetIndexEntry
+    for unchanged records.
     
     """
 
+    if es_index is not None:
+        return _upsert_exon_set_record_indexed(session, tx_ac, alt_ac, strand, method, ess, es_index)
+
     key = (tx_ac, alt_ac, method)
 
     existing = session.query(usam.ExonSet).filter(
@@ -790,6 +1174,38 @@ def _upsert_exon_set_record(session, tx_ac, alt_ac, strand, method, ess):
     else:
         old_es = None
 
+    es = _add_exon_set(session, tx_ac, alt_ac, strand, method, ess)
+    return es, old_es
+
+
+def _upsert_exon_set_record_indexed(session, tx_ac, alt_ac, strand, method, ess, es_index):
+    key = (tx_ac, alt_ac, method)
+    old = es_index.get(key)
+    old_es = None
+    if old is not None:
+        if old.ess == ess:
+            return (None, old)
+
+        esh = hashlib.sha1(old.ess.encode("ascii")).hexdigest()[:8]
+        archive_key = (tx_ac, alt_ac, method + "/" + esh)
+        if archive_key in es_index:
+            return (None, es_index[archive_key])
+
+        old_es = session.query(usam.ExonSet).get(old.exon_set_id)
+        old_es.alt_aln_method = archive_key[2]
+        session.flush()
+
+    es = _add_exon_set(session, tx_ac, alt_ac, strand, method, ess)
+    session.flush()
+
+    # update index only after changes were flushed successfully
+    if old is not None:
+        es_index[archive_key] = old._replace(alt_aln_method=archive_key[2])
+    es_index[key] = ExonSetIndexEntry(es.exon_set_id, tx_ac, alt_ac, method, ess)
+    return es, old_es
+
+
+def _add_exon_set(session, tx_ac, alt_ac, strand, method, ess):
     es = usam.ExonSet(
         tx_ac=tx_ac,
         alt_ac=alt_ac,
@@ -810,7 +1226,497 @@ def _upsert_exon_set_record(session, tx_ac, alt_ac, strand, method, ess):
         )
         session.add(ex)
 
-    return es, old_es
+    return es
+
+
+ExonSetIndexEntry = collections.namedtuple("ExonSetIndexEntry", [
+    "exon_set_id", "tx_ac", "alt_ac", "alt_aln_method", "ess"])
+
+
+def _fetch_exon_set_index(session, method=None):
+    """return dict of (tx_ac, alt_ac, alt_aln_method) -> ExonSetIndexEntry
+    for existing exon sets, fetched in one query; ess is the exon string
+    in transcript order, as from ExonSet.exons_as_str(transcript_order=True)
+
+    If method is given, only exon sets with that alt_aln_method, or
+    archived versions of it (method/<hash>), are fetched.
+
+    """
+    sql = """
+    select ES.exon_set_id, ES.tx_ac, ES.alt_ac, ES.alt_aln_method,
+           coalesce(string_agg(E.start_i || ',' || E.end_i, ';'
+                               order by case when ES.alt_strand = -1 then -E.start_i else E.start_i end), '') as ess
+    from exon_set ES
+    left join exon E on E.exon_set_id = ES.exon_set_id
+    {where}
+    group by ES.exon_set_id
+    """
+    if method is None:
+        rows = session.execute(sql.format(where=""))
+    else:
+        rows = session.execute(
+            sql.format(where="where ES.alt_aln_method = :method or ES.alt_aln_method like :archived"),
+            {"method": method, "archived": method + "/%"})
+    es_index = {}
+    for row in rows:
+        e = ExonSetIndexEntry(*row)
+        es_index[(e.tx_ac, e.alt_ac, e.alt_aln_method)] = e
+    logger.info("fetched index of {n} existing exon sets".format(n=len(es_index)))
+    return es_index
+
+
+def _rekey_exon_set_index(es_index, old_tx_ac, new_tx_ac):
+    """re-key index entries after transcript old_tx_ac is renamed to new_tx_ac"""
+    for key in [k for k in es_index if k[0] == old_tx_ac]:
+        e = es_index.pop(key)._replace(tx_ac=new_tx_ac)
+        es_index[(new_tx_ac, e.alt_ac, e.alt_aln_method)] = e
+
+
+def _load_exonset_bulk(session, opts, cf):
+    """load exonsets with set-based SQL
+
+    The file is staged into temporary tables with COPY. Exon sets are
+    then classified as new, unchanged, or deprecated in a few
+    statements, with the same semantics as _upsert_exon_set_record().
+    A key that appears more than once in the file is loaded in
+    successive passes (the first occurrence of each key in the first
+    pass, the second in the second, and so on), so that each
+    occurrence is compared with the result of the one before, as in
+    the per-row loader.  Rows that would fail (unknown transcript,
+    malformed or overlapping exons) are counted as errors and skipped.
+
+    """
+
+    passes = []                 # [(es_rows, ex_rows)] for each occurrence of a key
+    n_seen = collections.Counter()
+    n_rows = 0
+    n_errors = 0
+    esr, src = _open_records(opts, cf, ufes.ExonSetReader)
+    logger.info("opened " + opts["FILE"])
+    # columnar files provide exons as integers, without parsing exons_se_i
+    exons_col = esr.column("exons_se_i") if isinstance(esr, ufcol.ColumnarReader) else None
+    for i_es, es in enumerate(esr):
+        n_rows += 1
+        key = (es.tx_ac, es.alt_ac, es.method)
+        try:
+            strand = int(es.strand)
+            if exons_col is None:
+                exons = _parse_exons_se_i(es.exons_se_i, strand)
+            else:
+                exons = _check_exons(exons_col[i_es], strand, es.exons_se_i)
+        except ValueError as e:
+            logger.error("{key}: {e}; skipping".format(key=key, e=e))
+            n_errors += 1
+            continue
+        i_pass = n_seen[key]
+        n_seen[key] += 1
+        if i_pass == len(passes):
+            passes.append(([], []))
+        es_rows, ex_rows = passes[i_pass]
+        es_rows.append((i_es, es.tx_ac, es.alt_ac, es.method, strand, es.exons_se_i))
+        ex_rows.extend((i_es, s, e, i_ex) for i_ex, (s, e) in enumerate(exons))
+    src.close()
+    del n_seen
+    logger.info("parsed {n} exon sets in {n_passes} passes; {n_errors} errors".format(
+        n=sum(len(es_rows) for es_rows, _ in passes), n_passes=len(passes), n_errors=n_errors))
+
+    cur = session.connection().connection.cursor()
+    counts = collections.Counter(errors=n_errors)
+    while passes:
+        es_rows, ex_rows = passes.pop(0)
+        _stage_exon_sets(cur, es_rows, ex_rows)
+        del es_rows, ex_rows
+        counts.update(_merge_staged_exon_sets(cur))
+        cur.execute("drop table exonset_stage, exon_stage, exonset_existing, exonset_changed")
+
+    session.commit()
+    logger.info("{n_rows}/{n_rows} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, {n_deprecated} deprecated, {n_errors} n_errors".format(
+        n_rows=n_rows, n_new=counts["new"], n_unchanged=counts["unchanged"], n_deprecated=counts["deprecated"],
+        n_errors=counts["errors"], p=100.0))
+
+
+def _merge_staged_exon_sets(cur):
+    """merge staged exon sets (with distinct keys) into exon_set and
+    exon, as for _upsert_exon_set_record(); returns Counter of new,
+    unchanged, deprecated, and errors"""
+    counts = collections.Counter()
+
+    # exon sets for unknown transcripts would violate the transcript FK
+    cur.execute("""
+    delete from exonset_stage S
+    where not exists (select 1 from transcript T where T.ac = S.tx_ac)
+    returning tx_ac, alt_ac, alt_aln_method
+    """)
+    for row in cur.fetchall():
+        logger.error("{key}: no such transcript; skipping".format(key=row))
+        counts["errors"] += 1
+
+    # existing exon sets with the same key, with exons as strings in
+    # transcript order (cf. ExonSet.exons_as_str(transcript_order=True))
+    cur.execute("""
+    create temporary table exonset_existing on commit drop as
+    select S.stage_id, ES.exon_set_id,
+           coalesce(string_agg(E.start_i || ',' || E.end_i, ';'
+                               order by case when ES.alt_strand = -1 then -E.start_i else E.start_i end), '') as ess
+    from exonset_stage S
+    join exon_set ES on ES.tx_ac = S.tx_ac and ES.alt_ac = S.alt_ac and ES.alt_aln_method = S.alt_aln_method
+    left join exon E on E.exon_set_id = ES.exon_set_id
+    group by S.stage_id, ES.exon_set_id
+    """)
+    cur.execute("""
+    select X.stage_id, X.exon_set_id, X.ess, S.tx_ac, S.alt_ac, S.alt_aln_method
+    from exonset_existing X
+    join exonset_stage S on S.stage_id = X.stage_id
+    where X.ess != S.exons_se_i
+    """)
+    changed = cur.fetchall()
+    cur.execute("select count(*) from exonset_stage")
+    n_staged = cur.fetchone()[0]
+    cur.execute("select count(*) from exonset_existing")
+    n_existing = cur.fetchone()[0]
+    counts["new"] += n_staged - n_existing
+    counts["unchanged"] += n_existing - len(changed)
+
+    # changed exon sets are archived by appending a hash of the
+    # existing exons to alt_aln_method, unless that archive already
+    # exists (in which case the incoming exon set is ignored)
+    cur.execute("""
+    create temporary table exonset_changed (
+        stage_id integer primary key, exon_set_id integer not null, archive_method text not null
+    ) on commit drop
+    """)
+    _copy_rows(cur, "exonset_changed", ["stage_id", "exon_set_id", "archive_method"],
+               [(stage_id, exon_set_id, method + "/" + hashlib.sha1(ess.encode("ascii")).hexdigest()[:8])
+                for stage_id, exon_set_id, ess, tx_ac, alt_ac, method in changed])
+    cur.execute("""
+    delete from exonset_changed C
+    using exonset_stage S, exon_set ES
+    where C.stage_id = S.stage_id
+      and ES.tx_ac = S.tx_ac and ES.alt_ac = S.alt_ac and ES.alt_aln_method = C.archive_method
+    """)
+    counts["unchanged"] += cur.rowcount
+    cur.execute("""
+    update exon_set ES set alt_aln_method = C.archive_method
+    from exonset_changed C
+    where ES.exon_set_id = C.exon_set_id
+    """)
+    counts["deprecated"] += cur.rowcount
+
+    # insert new exon sets and their exons
+    _insert_staged_exon_sets(cur, """
+        where not exists (select 1 from exonset_existing X where X.stage_id = S.stage_id)
+           or exists (select 1 from exonset_changed C where C.stage_id = S.stage_id)
+    """)
+    return counts
+
+
+def _load_txinfo_bulk(session, opts, cf):
+    """load txinfo with prefetched state and bulk writes
+
+    Existing transcripts and transcript exon sets are fetched in two
+    queries, and the file is classified in memory, with the same
+    rules and warnings as the per-row loader.  CDS md5s for new
+    transcripts are then computed in a worker pool (--workers), and
+    all changes are written with multi-row updates and COPY in one
+    transaction.
+
+    """
+    self_aln_method = "transcript"
+    n_workers = int(opts.get("--workers") or 1)
+
+    origin_ids = dict(session.execute("select name, origin_id from origin").fetchall())
+    txs = {row["ac"]: dict(row) for row in session.execute(
+        "select ac, hgnc, cds_start_i, cds_end_i from transcript")}
+    logger.info("fetched {n} existing transcripts".format(n=len(txs)))
+    es_index = _fetch_exon_set_index(session, method=self_aln_method)
+
+    tir, src = _open_records(opts, cf, ufti.TxInfoReader)
+    logger.info("opened " + opts["FILE"])
+
+    tx_renames = []             # (ac, new_ac) for transcripts with changed CDS
+    hgnc_updates = {}           # ac (before renames) -> hgnc for existing transcripts
+    new_txs = collections.OrderedDict()  # ac -> new transcript row
+    es_archives = []            # (exon_set_id, archive_method) for existing exon sets
+    new_ess = collections.OrderedDict()  # key -> new exon set row [stage_id, ..., exons]
+
+    n_rows = 0
+    n_new = 0
+    n_unchanged = 0
+    n_cds_changed = 0
+    n_exons_changed = 0
+
+    for i_ti, ti in enumerate(tir):
+        n_rows += 1
+        if ti.exons_se_i == "":
+            logger.warning(ti.ac + ": no exons?!; skipping.")
+            continue
+
+        if ti.cds_se_i:
+            cds_start_i, cds_end_i = map(int, ti.cds_se_i.split(","))
+        else:
+            cds_start_i = cds_end_i = None
+
+        # 1. Find or make the transcript
+        u_tx = txs.get(ti.ac)
+        if u_tx is not None and (u_tx["cds_start_i"], u_tx["cds_end_i"]) != (cds_start_i, cds_end_i):
+            new_ac = "{u_tx[ac]}/{u_tx[cds_start_i]}..{u_tx[cds_end_i]}".format(u_tx=u_tx)
+            logger.warn("Transcript {ti.ac}: CDS coordinates changed!; renamed to {new_ac}".format(ti=ti, new_ac=new_ac))
+            if ti.ac in new_txs:
+                new_txs[new_ac] = dict(new_txs.pop(ti.ac), ac=new_ac)
+            else:
+                tx_renames.append((ti.ac, new_ac))
+            txs[new_ac] = dict(txs.pop(ti.ac), ac=new_ac)
+            # exon_set.tx_ac is renamed by FK cascade
+            _rekey_exon_set_index(es_index, ti.ac, new_ac)
+            for key in [k for k in new_ess if k[0] == ti.ac]:
+                new_ess[(new_ac,) + key[1:]] = new_ess.pop(key)
+                new_ess[(new_ac,) + key[1:]][1] = new_ac
+            u_tx = None
+            n_cds_changed += 1
+
+        if u_tx is None:
+            if ti.origin not in origin_ids:
+                logger.error("No origin for " + ti.origin)
+                raise NoResultFound("No origin for " + ti.origin)
+            u_tx = dict(ac=ti.ac, origin_id=origin_ids[ti.origin], hgnc=ti.hgnc,
+                        cds_start_i=cds_start_i, cds_end_i=cds_end_i, cds_md5=None)
+            new_txs[ti.ac] = u_tx
+            txs[ti.ac] = u_tx
+
+        if u_tx["hgnc"] != ti.hgnc:
+            logger.warn("{ti.ac}: HGNC symbol changed from {u_tx[hgnc]} to {ti.hgnc}".format(
+                u_tx=u_tx, ti=ti))
+            u_tx["hgnc"] = ti.hgnc
+            if ti.ac not in new_txs:
+                hgnc_updates[ti.ac] = ti.hgnc
+
+        # 2. Classify the transcript exon set as in _upsert_exon_set_record
+        key = (ti.ac, ti.ac, self_aln_method)
+        old = es_index.get(key)
+        if old is not None:
+            if old.ess == ti.exons_se_i:
+                logger.debug("Transcript {ti.ac} exon structure unchanged".format(ti=ti))
+                n_unchanged += 1
+                continue
+            archive_method = self_aln_method + "/" + hashlib.sha1(old.ess.encode("ascii")).hexdigest()[:8]
+            archive_key = (ti.ac, ti.ac, archive_method)
+            if archive_key in es_index:
+                logger.debug("Transcript {ti.ac} exon structure unchanged".format(ti=ti))
+                n_unchanged += 1
+                continue
+
+        # validate before archiving, so that an exon set is never
+        # archived without a replacement
+        try:
+            exons = _parse_exons_se_i(ti.exons_se_i, 1)
+        except ValueError as e:
+            logger.error("{ti.ac}: {e}; skipping exon set".format(ti=ti, e=e))
+            continue
+
+        if old is not None:
+            if old.exon_set_id is None:
+                new_ess[archive_key] = new_ess.pop(key)
+                new_ess[archive_key][3] = archive_method
+            else:
+                es_archives.append((old.exon_set_id, archive_method))
+            es_index[archive_key] = old._replace(alt_aln_method=archive_method)
+            logger.warn("Transcript {ti.ac} exon structure changed".format(ti=ti))
+            n_exons_changed += 1
+        else:
+            n_new += 1
+        new_ess[key] = [i_ti, ti.ac, ti.ac, self_aln_method, 1, ti.exons_se_i, exons]
+        es_index[key] = ExonSetIndexEntry(None, ti.ac, ti.ac, self_aln_method, ti.exons_se_i)
+    src.close()
+
+    logger.info("{n_rows} rows; {n_new} new, {n_unchanged} unchanged, "
+                "{n_cds_changed} cds changed, {n_exons_changed} exons changed; writing".format(
+                    n_rows=n_rows, n_new=n_new, n_unchanged=n_unchanged,
+                    n_cds_changed=n_cds_changed, n_exons_changed=n_exons_changed))
+
+    # 3. CDS md5s for new coding transcripts
+    cds_coords = [(tx["ac"], tx["cds_start_i"], tx["cds_end_i"])
+                  for tx in six.itervalues(new_txs) if tx["cds_start_i"] is not None]
+    if cds_coords:
+        for ac, cds_md5 in _fetch_cds_md5s(cf, cds_coords, n_workers):
+            new_txs[ac]["cds_md5"] = cds_md5
+        logger.info("computed {n} CDS md5s".format(n=len(cds_coords)))
+
+    # 4. Write
+    cur = session.connection().connection.cursor()
+    # hgnc_updates are keyed by ac as read, so precede the renames
+    if hgnc_updates:
+        psycopg2.extras.execute_values(cur, """
+        update transcript T set hgnc = V.hgnc from (values %s) V(ac, hgnc) where T.ac = V.ac
+        """, list(hgnc_updates.items()))
+    if tx_renames:
+        psycopg2.extras.execute_values(cur, """
+        update transcript T set ac = V.new_ac from (values %s) V(ac, new_ac) where T.ac = V.ac
+        """, tx_renames)
+    now = datetime.datetime.now()
+    _copy_rows(cur, "transcript", ["ac", "origin_id", "hgnc", "cds_start_i", "cds_end_i", "cds_md5", "added"],
+               [(tx["ac"], tx["origin_id"], tx["hgnc"], tx["cds_start_i"], tx["cds_end_i"], tx["cds_md5"], now)
+                for tx in six.itervalues(new_txs)])
+    if es_archives:
+        psycopg2.extras.execute_values(cur, """
+        update exon_set ES set alt_aln_method = V.alt_aln_method
+        from (values %s) V(exon_set_id, alt_aln_method) where ES.exon_set_id = V.exon_set_id
+        """, es_archives)
+    _stage_exon_sets(cur,
+                     [r[:6] for r in six.itervalues(new_ess)],
+                     [(r[0], s, e, i_ex) for r in six.itervalues(new_ess) for i_ex, (s, e) in enumerate(r[6])])
+    _insert_staged_exon_sets(cur)
+    session.commit()
+
+    logger.info("{n_rows}/{n_rows} {p:.1f}%; {n_new} new, {n_unchanged} unchanged, "
+                "{n_cds_changed} cds changed, {n_exons_changed} exons changed; commited".format(
+                    n_rows=n_rows, n_new=n_new, n_unchanged=n_unchanged,
+                    n_cds_changed=n_cds_changed, n_exons_changed=n_exons_changed, p=100.0))
+
+
+def _fetch_cds_md5s(cf, cds_coords, n_workers=1):
+    """generate (ac, md5) for (ac, cds_start_i, cds_end_i) in cds_coords,
+    fetching sequences in n_workers processes (in this process if 1)"""
+    batches = chunks(cds_coords, 250)
+    if n_workers > 1:
+        pool = multiprocessing.Pool(n_workers, initializer=_seqfetcher_worker_init, initargs=(cf,))
+        results = imap_bounded(pool, _seq_md5s, batches, max_pending=4 * n_workers)
+    else:
+        pool = None
+        _seqfetcher_init(cf)
+        results = six.moves.map(_seq_md5s, batches)
+    try:
+        for batch in results:
+            for ac, md5 in batch:
+                yield ac, md5
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+_worker_sf = None               # per-process sequence fetcher for _seq_md5s and _fetch_first_seqs
+
+
+def _seqfetcher_init(cf):
+    global _worker_sf
+    _worker_sf = _get_seqfetcher(cf)
+
+
+def _seqfetcher_worker_init(cf):
+    # SIGINT is handled by the parent, which commits before exiting
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _seqfetcher_init(cf)
+
+
+def _seq_md5s(coords):
+    """return list of (ac, md5) for the sequences (ac, start_i, end_i) in coords"""
+    results = []
+    for ac, s, e in coords:
+        try:
+            seq = _worker_sf.fetch(ac, s, e)
+        except KeyError:
+            raise Exception("{ac}: not in sequence database".format(ac=ac))
+        results.append((ac, seq_md5(seq)))
+    return results
+
+
+def _fetch_first_seqs(rows):
+    """return list of (seq_id, len, acs, seq) for rows of (seq_id, len,
+    acs), where seq is the upper-cased sequence of the first accession
+    in acs that is found, or None"""
+    results = []
+    for seq_id, seq_len, acs in rows:
+        seq = None
+        for ac in acs:
+            try:
+                seq = _worker_sf.fetch(ac).upper()
+                break
+            except KeyError:
+                pass
+        results.append((seq_id, seq_len, acs, seq))
+    return results
+
+
+def _stage_exon_sets(cur, es_rows, ex_rows):
+    """create temporary tables exonset_stage and exon_stage and COPY
+    es_rows (stage_id, tx_ac, alt_ac, alt_aln_method, alt_strand,
+    exons_se_i) and ex_rows (stage_id, start_i, end_i, ord) into them"""
+    cur.execute("""
+    create temporary table exonset_stage (
+        stage_id integer primary key, tx_ac text not null, alt_ac text not null,
+        alt_aln_method text not null, alt_strand smallint not null, exons_se_i text not null
+    ) on commit drop;
+    create temporary table exon_stage (
+        stage_id integer not null, start_i integer not null, end_i integer not null, ord integer not null
+    ) on commit drop;
+    """)
+    _copy_rows(cur, "exonset_stage", ["stage_id", "tx_ac", "alt_ac", "alt_aln_method", "alt_strand", "exons_se_i"], es_rows)
+    _copy_rows(cur, "exon_stage", ["stage_id", "start_i", "end_i", "ord"], ex_rows)
+    cur.execute("analyze exonset_stage; analyze exon_stage")
+
+
+def _insert_staged_exon_sets(cur, where_sql=""):
+    """insert staged exon sets (exonset_stage S, optionally restricted
+    by where_sql) and their staged exons"""
+    cur.execute("""
+    with new_es as (
+        insert into exon_set (tx_ac, alt_ac, alt_aln_method, alt_strand, added)
+        select S.tx_ac, S.alt_ac, S.alt_aln_method, S.alt_strand, now()
+        from exonset_stage S
+        {where}
+        returning exon_set_id, tx_ac, alt_ac, alt_aln_method
+    )
+    insert into exon (exon_set_id, start_i, end_i, ord)
+    select N.exon_set_id, E.start_i, E.end_i, E.ord
+    from new_es N
+    join exonset_stage S on S.tx_ac = N.tx_ac and S.alt_ac = N.alt_ac and S.alt_aln_method = N.alt_aln_method
+    join exon_stage E on E.stage_id = S.stage_id
+    """.format(where=where_sql))
+
+
+def _parse_exons_se_i(ess, strand):
+    """parse exons_se_i string ("s,e;s,e;...") into list of (start_i,
+    end_i) in transcript order; raises ValueError for malformed,
+    empty, or duplicated exon coordinates"""
+    return _check_exons([tuple(int(i) for i in se.split(",")) for se in ess.split(";")], strand, ess)
+
+
+def _check_exons(exons, strand, ess):
+    """validate and sort list of (start_i, end_i) exons parsed from ess, as
+    _parse_exons_se_i"""
+    if not exons or any(len(ex) != 2 or ex[0] >= ex[1] for ex in exons):
+        raise ValueError("malformed exons " + ess)
+    if len(set(ex[0] for ex in exons)) != len(exons) or len(set(ex[1] for ex in exons)) != len(exons):
+        raise ValueError("duplicate exon coordinates in " + ess)
+    exons.sort(reverse=strand == MINUS_STRAND)
+    return exons
+
+
+def _pg_array_literal(values):
+    """return values (strings) as a PostgreSQL array literal
+
+    >>> print(_pg_array_literal(["A1", 'B "2"', ""]))
+    {"A1","B \\"2\\"",""}
+
+    """
+    return "{" + ",".join('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values) + "}"
+
+
+def _copy_rows(cur, table, columns, rows):
+    """COPY rows (sequences of values) into table via a temporary file"""
+    def _esc(v):
+        if v is None:
+            return "\\N"
+        return six.text_type(v).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    with tempfile.TemporaryFile() as fh:
+        for row in rows:
+            fh.write(("\t".join(_esc(v) for v in row) + "\n").encode("utf-8"))
+        fh.seek(0)
+        cur.copy_expert("COPY {table} ({columns}) FROM STDIN".format(
+            table=table, columns=",".join(columns)), fh)
 
 
 # <LICENSE>
@@ -1,7 +1,9 @@
 import csv
+import gzip
 import itertools
 
 from uta.exceptions import *
+from uta.tools.extsort import external_sort
 
 
 class SeqGeneParser(object):
@@ -29,40 +31,111 @@ class SeqGeneParser(object):
         raise StopIteration
 
 
-# The following code doesn"t work and I don"t know why.
-# class SeqGeneBlockParser(object):
-##     """parse mapping data as from ftp.ncbi.nih.gov/genomes/MapView/Homo_sapiens/sequence/current/initial_release/seq_gene.md.gz"""
-# def __init__(self,fh,filter=None):
-##         self._sgparser = SeqGeneParser(fh,filter)
-##
-# def __iter__(self):
-# return self
-##
-# def next(self):
-##         slurp = list(self._sgparser)
-##         slurp.sort(key = lambda r: (r["transcript"],r["group_label"],r["chr_start"],r["chr_stop"]))
-##         iter = itertools.groupby(slurp, key = lambda r: (r["transcript"],r["group_label"]))
-##         import IPython; IPython.embed()
-# for k,i in iter:
-# return k,i
-##         raise StopIteration
+class SeqGeneBlockParser(object):
+
+    """parse seq_gene files (see SeqGeneParser) into blocks of records
+    for each (transcript, group_label)
+
+    Iterating yields (transcript, group_label, records) tuples in order
+    of (transcript, group_label), with records (dicts, as from
+    SeqGeneParser) ordered by (chr_start, chr_stop).
+
+    Input that is already in (transcript, group_label) order is
+    streamed in constant memory.  Otherwise, records are sorted in
+    memory in runs of up to max_records; if the input exceeds one run,
+    the runs are written to temporary files (in tmpdir) and merged.
+
+    If presorted is None (the default), fh is scanned for order first
+    (up to the first out-of-order record) and rewound, so fh must
+    support tell() and seek(); input that can't be rewound is sorted,
+    as is gzip input, which a scan would decompress twice.  If
+    presorted is True, the scan is skipped, and UTAError is raised on
+    out-of-order input; if False, the input is always sorted.
+
+    """
+
+    def __init__(self, fh, filter=None, presorted=None, max_records=50000, tmpdir=None):
+        if presorted is None:
+            presorted = _is_presorted(fh, filter)
+        self._sgparser = SeqGeneParser(fh, filter)
+        self._presorted = presorted
+        self._max_records = max_records
+        self._tmpdir = tmpdir
+        self._blocks = None
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self._blocks is None:
+            recs = self._sorted_records() if not self._presorted else self._checked_records()
+            self._blocks = self._group(recs)
+        return next(self._blocks)
+
+    __next__ = next
+
+    ############################################################################
+    # Internal methods
+
+    def _group(self, recs):
+        for (tx, group_label), block in itertools.groupby(recs, key=_block_key):
+            yield tx, group_label, sorted(block, key=_rec_key)
+
+    def _checked_records(self):
+        prev = None
+        for r in self._sgparser:
+            key = _block_key(r)
+            if prev is not None and key < prev:
+                raise UTAError("seq_gene records are not in (transcript, group_label) order: "
+                               "{key} follows {prev}; use presorted=False".format(key=key, prev=prev))
+            prev = key
+            yield r
+
+    def _sorted_records(self):
+        # records are pickled in runs so that they are read back
+        # exactly, including None for missing fields
+        return external_sort(self._sgparser, key=_rec_key,
+                             max_records=self._max_records, tmpdir=self._tmpdir)
+
+
+def _is_presorted(fh, filter=None):
+    """return True if the seq_gene records in fh (passing filter) are in
+    (transcript, group_label) order, and rewind fh; returns False
+    without reading if fh can't be rewound or is gzipped"""
+    if isinstance(fh, gzip.GzipFile):
+        return False
+    try:
+        pos = fh.tell()
+    except (AttributeError, IOError, ValueError):
+        return False
+    prev = None
+    try:
+        for r in SeqGeneParser(fh, filter):
+            key = _block_key(r)
+            if prev is not None and key < prev:
+                return False
+            prev = key
+        return True
+    finally:
+        fh.seek(pos)
+
+
+def _block_key(r):
+    return r["transcript"], r["group_label"]
+
+
+def _rec_key(r):
+    return r["transcript"], r["group_label"], int(r["chr_start"]), int(r["chr_stop"])
 
 
 if __name__ == "__main__":
-    import gzip
     import prettytable
     import IPython
     import sys
     fh = gzip.open(sys.argv[1])
     nm_filter = lambda r: r["transcript"].startswith("NM_")
-    sgparser = SeqGeneParser(fh, filter=nm_filter)
-    slurp = list(sgparser)
-    slurp.sort(key=lambda r: (
-        r["transcript"], r["group_label"], r["chr_start"], r["chr_stop"]))
-    iter = itertools.groupby(
-        slurp, key=lambda r: (r["transcript"], r["group_label"]))
-    for k, i in iter:
-        print(k, len(list(i)))
+    for tx, group_label, recs in SeqGeneBlockParser(fh, filter=nm_filter):
+        print((tx, group_label), len(recs))
 
 # <LICENSE>
 # Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
@@ -0,0 +1,174 @@
+"""caches of query results for uta.dataprovider
+
+A cache is any object with get(key, default=None) and put(key, value)
+methods; keys are tuples of str, int, float, bool, and None.  Three
+are provided:
+
+* LRUCache: in-process, least-recently-used, of bounded size
+* SQLiteCache: persistent, in an sqlite3 database file (as for
+  ExonAlnCache), with values pickled
+* LayeredCache: a sequence of caches, such as an LRUCache in front of
+  an SQLiteCache; hits in later layers are copied to earlier ones
+
+make_cache() builds the usual configurations.
+
+Cached values are shared between callers and must not be modified.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import collections
+import json
+import pickle
+import sqlite3
+import threading
+
+_missing = object()
+
+CacheInfo = collections.namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class LRUCache(object):
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return "{self.__class__.__name__}(maxsize={self.maxsize}; {n} entries)".format(self=self, n=len(self))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.pop(key, _missing)
+            if value is _missing:
+                self.misses += 1
+                return default
+            self._data[key] = value         # most recently used is last
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+
+class SQLiteCache(object):
+
+    def __init__(self, path, timeout=300):
+        self._path = path
+        self._con = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._con.execute("pragma journal_mode=wal")
+        self._con.execute("""
+            create table if not exists query_cache (
+                key text primary key,
+                value blob not null
+            )""")
+        self._con.commit()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self._path!r})".format(self=self)
+
+    def __len__(self):
+        with self._lock:
+            return self._con.execute("select count(*) from query_cache").fetchone()[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._con.execute(
+                "select value from query_cache where key=?", (_key_str(key),)).fetchone()
+        return default if row is None else pickle.loads(bytes(row[0]))
+
+    def put(self, key, value):
+        blob = sqlite3.Binary(pickle.dumps(value, protocol=2))
+        with self._lock:
+            self._con.execute(
+                "insert or replace into query_cache (key, value) values (?,?)",
+                (_key_str(key), blob))
+            self._con.commit()
+
+    def clear(self):
+        with self._lock:
+            self._con.execute("delete from query_cache")
+            self._con.commit()
+
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+
+class LayeredCache(object):
+
+    def __init__(self, layers):
+        self.layers = list(layers)
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self.layers!r})".format(self=self)
+
+    def get(self, key, default=None):
+        for i, layer in enumerate(self.layers):
+            value = layer.get(key, _missing)
+            if value is not _missing:
+                for upper in self.layers[:i]:
+                    upper.put(key, value)
+                return value
+        return default
+
+    def put(self, key, value):
+        for layer in self.layers:
+            layer.put(key, value)
+
+    def clear(self):
+        for layer in self.layers:
+            layer.clear()
+
+
+def make_cache(maxsize=10000, path=None):
+    """return an LRUCache of maxsize entries, in front of an
+    SQLiteCache at path if path is given"""
+    lru = LRUCache(maxsize=maxsize)
+    if path is None:
+        return lru
+    return LayeredCache([lru, SQLiteCache(path)])
+
+
+def _key_str(key):
+    # json distinguishes 1 from "1" and is stable across Python versions
+    return json.dumps(list(key), separators=(",", ":"))
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
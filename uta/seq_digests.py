@@ -0,0 +1,139 @@
+"""md5 digests and lengths of SeqRepo sequences without fetching them whole
+
+seqinfo records need only the md5 and length of most sequences, but
+str(sr[ac]) reads a whole sequence (hundreds of megabytes for a
+chromosome) into memory.  seqrepo_md5_len() instead uses, in order:
+
+* SeqDigestCache, a persistent accession -> (md5, len) cache, if given;
+* SeqRepo's stored metadata: the MD5 alias that SeqRepo records for
+  each sequence it stores, and the length in its sequence index;
+* a digest computed from the sequence fetched in chunks.
+
+Digests are computed as bioutils.digests.seq_md5 computes them, on the
+sequence without whitespace or "*", upper-cased; lengths are of the
+sequence as stored.
+
+The cache is an sqlite3 database file, as for ExonAlnCache.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import logging
+import sqlite3
+
+from bioutils.sequences import normalize_sequence, to_unicode
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 10 * 2**20
+
+
+class SeqDigestCache(object):
+
+    def __init__(self, path, timeout=300):
+        self._path = path
+        self._con = sqlite3.connect(path, timeout=timeout)
+        self._con.execute("pragma journal_mode=wal")
+        self._con.execute("""
+            create table if not exists seq_digest_cache (
+                ac text primary key,
+                md5 text not null,
+                len integer not null
+            )""")
+        self._con.commit()
+
+    def __repr__(self):
+        return "{self.__class__.__name__}({self._path!r})".format(self=self)
+
+    def __len__(self):
+        return self._con.execute("select count(*) from seq_digest_cache").fetchone()[0]
+
+    def get(self, ac):
+        """return (md5, len) for ac, or None if not cached"""
+        row = self._con.execute(
+            "select md5, len from seq_digest_cache where ac=?", (ac,)).fetchone()
+        return None if row is None else tuple(row)
+
+    def put(self, ac, md5, length):
+        """cache (md5, length) for ac; not durable until commit()"""
+        self._con.execute(
+            "insert or replace into seq_digest_cache (ac, md5, len) values (?,?,?)",
+            (ac, md5, length))
+
+    def commit(self):
+        self._con.commit()
+
+    def close(self):
+        self._con.commit()
+        self._con.close()
+
+
+def seqrepo_md5_len(sr, ac, cache=None, chunk_size=CHUNK_SIZE):
+    """return (md5, len) of the sequence for ac in SeqRepo sr; raises
+    KeyError if ac is not in sr
+
+    Results not from cache are added to it (uncommitted).
+
+    """
+    if cache is not None:
+        md5_len = cache.get(ac)
+        if md5_len is not None:
+            return md5_len
+    md5_len = _seqrepo_metadata_md5_len(sr, ac)
+    if md5_len is None:
+        md5_len = streamed_md5_len(sr, ac, chunk_size)
+    if cache is not None:
+        cache.put(ac, *md5_len)
+    return md5_len
+
+
+def streamed_md5_len(sr, ac, chunk_size=CHUNK_SIZE):
+    """return (md5, len) of the sequence for ac in SeqRepo sr, fetched
+    chunk_size residues at a time; chunks are normalized as by seq_md5,
+    which is the same as normalizing the whole sequence"""
+    md5 = hashlib.md5()
+    length = 0
+    while True:
+        chunk = sr.fetch(ac, start=length, end=length + chunk_size)
+        md5.update(normalize_sequence(to_unicode(chunk)).encode("ascii"))
+        length += len(chunk)
+        if len(chunk) < chunk_size:
+            return md5.hexdigest(), length
+
+
+def _seqrepo_metadata_md5_len(sr, ac):
+    """return (md5, len) for ac from SeqRepo aliases and sequence
+    index, or None if unavailable"""
+    try:
+        seq_ids = set(a["seq_id"] for a in sr.aliases.find_aliases(alias=ac))
+        if len(seq_ids) != 1:
+            return None
+        seq_id = seq_ids.pop()
+        md5s = [a["alias"] for a in sr.aliases.find_aliases(seq_id=seq_id, namespace="MD5")]
+        if len(md5s) != 1:
+            return None
+        length = sr.sequences.fetch_seqinfo(seq_id)["len"]
+    except (AttributeError, KeyError, TypeError) as e:
+        # older SeqRepo versions lack some of these interfaces
+        logger.debug("{ac}: no SeqRepo metadata ({e})".format(ac=ac, e=e))
+        return None
+    return md5s[0], length
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
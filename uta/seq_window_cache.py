@@ -0,0 +1,139 @@
+"""in-memory cache of sequence windows in front of a sequence fetcher
+
+Loading steps often fetch many small, neighboring slices of the same
+sequence (e.g., the exons of one transcript on a chromosome).  With
+SeqRepo, each fetch decompresses part of a bgzipped FASTA.
+SeqWindowCache fetches a larger window once -- a whole transcript, or
+a genomic region spanning all exons of an exon set -- and serves
+subsequent slices from memory.  Windows are evicted in
+least-recently-used order when the total cached sequence exceeds
+max_bytes.
+
+SeqWindowCache provides the fetch(ac, start_i, end_i) interface of
+SeqRepo, so it may be used wherever a sequence fetcher is expected.
+Windows are loaded only by explicit calls to prefetch(); whole-sequence
+prefetches should be limited to short sequences such as transcripts.
+
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import collections
+
+
+class SeqWindowCache(object):
+
+    def __init__(self, sf, max_bytes=256 * 2**20, max_window=10 * 2**20):
+        self._sf = sf
+        self.max_bytes = max_bytes
+        self.max_window = max_window
+        self._windows = collections.OrderedDict()  # (ac, start_i, end_i, whole) -> seq, in LRU order
+        self._ac_windows = collections.defaultdict(set)  # ac -> set of keys in _windows
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return ("{self.__class__.__name__}({self._sf}; {n} windows, {self.n_bytes} bytes; "
+                "{self.hits}/{self.misses} hit/miss)").format(self=self, n=len(self._windows))
+
+    def fetch(self, ac, start_i=None, end_i=None):
+        """return sequence ac[start_i:end_i], from a cached window if
+        possible; raises KeyError if ac is not known to the underlying
+        fetcher
+
+        """
+        if start_i is None and end_i is None:
+            key = self._find_whole(ac)
+        elif start_i is not None and end_i is not None:
+            key = self._find(ac, start_i, end_i)
+        else:
+            key = None
+        if key is not None:
+            self.hits += 1
+            self._touch(key)
+            if start_i is None:
+                return self._windows[key]
+            return self._windows[key][start_i - key[1]:end_i - key[1]]
+        self.misses += 1
+        return self._sf.fetch(ac, start_i, end_i)
+
+    def prefetch(self, ac, start_i=None, end_i=None):
+        """fetch and cache window ac[start_i:end_i] (the whole sequence
+        if start_i and end_i are None) unless already cached or larger
+        than max_window; accessions unknown to the underlying fetcher
+        are ignored
+
+        """
+        if start_i is not None and end_i is not None:
+            if end_i - start_i > self.max_window:
+                return
+            if self._find(ac, start_i, end_i) is not None:
+                return
+        elif self._find_whole(ac) is not None:
+            return
+
+        try:
+            seq = self._sf.fetch(ac, start_i, end_i)
+        except KeyError:
+            return
+        if seq is None or len(seq) > self.max_window:
+            return
+
+        # record the extent actually returned; fetchers truncate at the
+        # end of the sequence, and slices beyond that are not cached
+        start_i = start_i or 0
+        whole = end_i is None
+        key = (ac, start_i, start_i + len(seq), whole)
+        self._windows[key] = seq
+        self._ac_windows[ac].add(key)
+        self.n_bytes += len(seq)
+        self._evict()
+
+    def clear(self):
+        self._windows.clear()
+        self._ac_windows.clear()
+        self.n_bytes = 0
+
+    ############################################################################
+    # Internal methods
+
+    def _find(self, ac, start_i, end_i):
+        for key in self._ac_windows.get(ac, ()):
+            if key[1] <= start_i and end_i <= key[2]:
+                return key
+        return None
+
+    def _find_whole(self, ac):
+        for key in self._ac_windows.get(ac, ()):
+            if key[3]:
+                return key
+        return None
+
+    def _touch(self, key):
+        self._windows[key] = self._windows.pop(key)
+
+    def _evict(self):
+        while self.n_bytes > self.max_bytes and self._windows:
+            key, seq = self._windows.popitem(last=False)
+            self._ac_windows[key[0]].discard(key)
+            if not self._ac_windows[key[0]]:
+                del self._ac_windows[key[0]]
+            self.n_bytes -= len(seq)
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
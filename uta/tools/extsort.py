@@ -0,0 +1,83 @@
+"""sorting of streams too large to sort in memory"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import heapq
+import itertools
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:                                 # py3
+    import pickle
+
+
+def external_sort(iterable, key, max_records=50000, tmpdir=None):
+    """generate the items of iterable in order of key(item), as
+    sorted() would (ties keep input order)
+
+    Items are sorted in memory in runs of up to max_records.  If the
+    input exceeds one run, runs are pickled to temporary files (in
+    tmpdir) and merged, so that at most one run is held in memory;
+    items must then be picklable.
+
+    >>> list(external_sort([3, 1, 2, 1, 0], key=lambda i: i, max_records=2))
+    [0, 1, 1, 2, 3]
+
+    """
+    it = iter(iterable)
+    runs = []
+    try:
+        while True:
+            buf = list(itertools.islice(it, max_records))
+            buf.sort(key=key)
+            if not runs and len(buf) < max_records:
+                for item in buf:    # input fit in memory
+                    yield item
+                return
+            if buf:
+                runs.append(_write_run(buf, tmpdir))
+            if len(buf) < max_records:
+                break
+        del buf
+        for _, _, _, item in heapq.merge(*[_read_run(run_i, fh, key) for run_i, fh in enumerate(runs)]):
+            yield item
+    finally:
+        for fh in runs:
+            fh.close()
+
+
+def _write_run(items, tmpdir):
+    fh = tempfile.TemporaryFile(dir=tmpdir)
+    for item in items:
+        pickle.dump(item, fh, protocol=2)
+    fh.seek(0)
+    return fh
+
+
+def _read_run(run_i, fh, key):
+    # yields (key, run_i, item_i, item) so that heapq.merge need not
+    # support key= and never compares items; ties keep input order
+    for item_i in itertools.count():
+        try:
+            item = pickle.load(fh)
+        except EOFError:
+            return
+        yield key(item), run_i, item_i, item
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>
@@ -0,0 +1,73 @@
+"""helpers for feeding process pools from large streams"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import collections
+import itertools
+
+
+def imap_bounded(pool, func, iterable, max_pending):
+    """like pool.imap(func, iterable), but with at most max_pending
+    tasks outstanding, so that iterable is consumed only as fast as
+    results are; Pool.imap reads its input eagerly
+
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def chunks(iterable, n):
+    """yield successive lists of up to n items from iterable
+
+    >>> list(chunks(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+
+    """
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def group_chunks(iterable, n, key):
+    """yield successive lists of items from iterable, as chunks() does,
+    except that runs of consecutive items with equal key(item) are
+    never split; a list ends at the first run boundary at or after n
+    items
+
+    >>> list(group_chunks([10, 11, 20, 21, 22, 30, 40], 2, key=lambda i: i // 10))
+    [[10, 11], [20, 21, 22], [30, 40]]
+
+    """
+    chunk = []
+    for _, run in itertools.groupby(iterable, key):
+        chunk.extend(run)
+        if len(chunk) >= n:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# <LICENSE>
+# Copyright 2014 UTA Contributors (https://bitbucket.org/biocommons/uta)
+##
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+##
+# http://www.apache.org/licenses/LICENSE-2.0
+##
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# </LICENSE>